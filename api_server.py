@@ -4,21 +4,228 @@ api_server.py
 Simple Flask server exposing capital lookup and enrichment via REST API.
 
 Endpoints:
+  GET /api/countries
+  GET /api/bundle          302 to the current /api/bundle/<hash> (all data in one immutable download)
   GET /api/capital?country=us&state=California
   GET /api/enriched?capital=Sacramento
   GET /api/random?country=us
+  GET /api/lookup?country=us&state=california
+  POST /api/lookup/batch   body: [{"country": "us", "state": "california"}, ...]
+  GET /api/suggest?country=us&q=new&limit=10
+  POST /api/quiz           body: {"country": "us"}  -> {"quiz_id": ...}
+  GET /api/quiz/<quiz_id>/next   next region, no repeats until all have come up
+  GET /api/cache/status
+  GET /metrics             Prometheus text format (disable with CAPITAL_METRICS=0)
+  GET|POST /api/admin/profile, GET /api/admin/profile/download
+                           request profiling, enabled by CAPITAL_PROFILE_TOKEN (see profiling.py)
+
+Every client is rate limited (CAPITAL_RATE_LIMIT requests/second, default
+20) and /api/enriched spends a global upstream budget on capitals outside
+the dataset; callers over either limit get 429 with Retry-After (see
+ratelimit.py). Behind reverse proxies, set CAPITAL_TRUST_PROXY to the
+number of proxies so clients are told apart by X-Forwarded-For.
+
+Set CAPITAL_WARM_CACHE=1 to pre-warm and periodically refresh Wikipedia
+summaries for every capital in the background (see cache_warmer.py).
 
 Run:
-  python api_server.py
+  python api_server.py               # threaded Flask server (default)
+  python api_server.py --mode asgi   # async server for slow-upstream concurrency (see asgi_app.py)
 Then access http://localhost:5000/api/capital?country=us&state=california
 """
-from flask import Flask, request, jsonify
-from capital_lookup import find_capital, random_pick, get_fact_with_enrichment
+import gzip
+import hashlib
+import os
+import time
+
+from flask import Flask, Response, g, request, jsonify, redirect, url_for
+from capital_lookup import (
+    find_capital, random_pick, get_fact_with_enrichment, get_facts_with_enrichment, lookup_result,
+    normalize, enrichment_version, did_you_mean, suggest, countries,
+)
+from capital_enricher import LRUCache
+import metrics
+import profiling
+from profiling import PROFILER
+from ratelimit import CLIENT_LIMITER, TRUSTED_PROXIES, retry_after, upstream_wait
+from cache_warmer import CacheWarmer
+from quiz import open_quiz_store
+from bundle import current_bundle, load_bundle
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 app = Flask(__name__)
 CORS(app)  # enable CORS for all routes
 
+MAX_BATCH_SIZE = 100
+MAX_SUGGESTIONS = 50
+# seconds a request waits for Wikipedia before answering with the local fact
+ENRICH_DEADLINE = float(os.environ.get('CAPITAL_ENRICH_DEADLINE', '1.0'))
+
+# Cache-Control max-age (seconds) for static lookups, Wikipedia-enriched
+# answers, and local-only answers that may gain a summary soon
+STATIC_MAX_AGE = 86400
+ENRICHED_MAX_AGE = 3600
+FALLBACK_MAX_AGE = 30
+GZIP_MIN_SIZE = 512  # bodies smaller than this are not worth compressing
+BUNDLE_MAX_AGE = 31536000  # content-hashed bundle URLs never change
+
+WARMER = None
+
+REQUEST_LATENCY = metrics.Histogram(
+    'capital_http_request_duration_seconds', 'API request latency by endpoint.', ['endpoint'])
+REQUESTS = metrics.Counter('capital_http_requests_total', 'API requests by endpoint and status.', ['endpoint', 'status'])
+RATE_LIMITED = metrics.Counter('capital_rate_limited_total', 'Requests refused with 429, by limit.', ['limit'])
+
+if metrics.ENABLED:
+    # hooks are only installed when metrics are on, so a disabled build pays nothing per request
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - g.request_started)
+        REQUESTS.labels(endpoint, str(response.status_code)).inc()
+        return response
+
+if profiling.ENABLED:
+    # like metrics, nothing is installed (and nothing runs per request) without a profile token
+    @app.before_request
+    def _start_profile():
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        if endpoint.startswith('/api/admin/'):
+            return
+        forced = PROFILER.check_token(request.headers.get('X-Profile-Token'))
+        g.profile = PROFILER.start(endpoint, forced)
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        handle = g.pop('profile', None)
+        if handle is not None:
+            PROFILER.stop(handle)
+
+
+if TRUSTED_PROXIES:
+    # only the hops our own proxies appended are trusted; the client writes the rest
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+
+def client_address() -> str:
+    """The address requests are rate limited by."""
+    return request.remote_addr or 'unknown'
+
+
+def too_many_requests(wait: float, limit: str) -> Response:
+    """429 response telling the client when to retry."""
+    if metrics.ENABLED:
+        RATE_LIMITED.labels(limit).inc()
+    seconds = retry_after(wait)
+    response = jsonify({'error': 'Too many requests', 'retry_after': seconds})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(seconds)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+if CLIENT_LIMITER.enabled:
+    @app.before_request
+    def _limit_client():
+        if request.path == '/metrics':
+            return None
+        wait = CLIENT_LIMITER.acquire(client_address())
+        if wait:
+            return too_many_requests(wait, 'client')
+        return None
+
+
+def start_warmer() -> CacheWarmer:
+    """Start the background cache warmer (idempotent)."""
+    global WARMER
+    if WARMER is None:
+        WARMER = CacheWarmer(
+            ttl=float(os.environ.get('CAPITAL_CACHE_TTL', str(7 * 24 * 3600))),
+            max_rps=float(os.environ.get('CAPITAL_WARM_RPS', '1.0')),
+        )
+        WARMER.start()
+    return WARMER
+
+
+class CachedBody:
+    """A pre-serialized JSON response with its strong ETag and optional gzip variant.
+    
+    Bodies derived from enrichment remember the enrichment version of their
+    capital and are rebuilt once it changes (or once `max_age` passes).
+    """
+    __slots__ = ('body', 'gzipped', 'etag', 'status', 'max_age', 'expires_at', 'capital', 'version')
+
+    def __init__(self, payload, status: int, max_age: int, capital: str = None, version=None):
+        self.body = jsonify(payload).get_data()
+        self.gzipped = gzip.compress(self.body, mtime=0) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.status = status
+        self.max_age = max_age
+        self.expires_at = time.monotonic() + max_age
+        self.capital = capital
+        self.version = version
+
+    def is_fresh(self) -> bool:
+        if time.monotonic() >= self.expires_at:
+            return False
+        return self.capital is None or enrichment_version(self.capital) == self.version
+
+    def to_response(self) -> Response:
+        """Serve this body, honouring If-None-Match and Accept-Encoding."""
+        # accept_encodings honours q-values, so 'gzip;q=0' means no gzip
+        use_gzip = self.gzipped is not None and bool(request.accept_encodings['gzip'])
+        # each encoding is a different representation, so it gets its own strong ETag
+        etag = f'{self.etag}-gzip' if use_gzip else self.etag
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzipped if use_gzip else self.body, status=self.status,
+                                mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        if self.gzipped is not None:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+RESPONSE_CACHE = LRUCache(int(os.environ.get('CAPITAL_RESPONSE_CACHE_SIZE', '4096')))
+
+QUIZZES = open_quiz_store()
+metrics.Gauge('capital_quiz_sessions', 'Quiz sessions held in memory.', lambda: len(QUIZZES))
+
+
+def cached_response(key: tuple, build) -> Response:
+    """Serve the cached body for `key`, calling `build()` for a new CachedBody when needed."""
+    cached = RESPONSE_CACHE.get(key)
+    if cached is None or not cached.is_fresh():
+        cached = build()
+        RESPONSE_CACHE.put(key, cached)
+    return cached.to_response()
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose counters and latency histograms in the Prometheus text format."""
+    if not metrics.ENABLED:
+        return jsonify({'error': 'Metrics are disabled (CAPITAL_METRICS=0)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _not_found(state: str, country: str) -> dict:
+    """404 body for an unknown state, with close matches to retry with."""
+    return {'error': 'Capital not found', 'did_you_mean': did_you_mean(state, country)}
+
+
+def _enriched_max_age(enriched: dict) -> int:
+    return ENRICHED_MAX_AGE if enriched.get('source') == 'wikipedia' else FALLBACK_MAX_AGE
+
 
 @app.route('/api/capital', methods=['GET'])
 def api_capital():
@@ -29,11 +236,13 @@ def api_capital():
     if not state:
         return jsonify({'error': 'Missing state parameter'}), 400
     
-    result = find_capital(state, country)
-    if not result:
-        return jsonify({'error': 'Capital not found'}), 404
+    def build():
+        result = find_capital(state, country)
+        if not result:
+            return CachedBody(_not_found(state, country), 404, STATIC_MAX_AGE)
+        return CachedBody(result, 200, STATIC_MAX_AGE)
     
-    return jsonify(result)
+    return cached_response(('capital', country, normalize(state)), build)
 
 
 @app.route('/api/enriched', methods=['GET'])
@@ -44,8 +253,116 @@ def api_enriched():
     if not capital:
         return jsonify({'error': 'Missing capital parameter'}), 400
     
-    enriched = get_fact_with_enrichment(capital)
-    return jsonify(enriched)
+    # unknown, uncached capitals would go to Wikipedia: they share one global budget
+    wait = upstream_wait(capital)
+    if wait:
+        return too_many_requests(wait, 'upstream')
+    
+    def build():
+        version = enrichment_version(capital)
+        enriched = get_fact_with_enrichment(capital, timeout=ENRICH_DEADLINE)
+        return CachedBody(enriched, 200, _enriched_max_age(enriched), capital, version)
+    
+    return cached_response(('enriched', capital), build)
+
+
+def _profile_admin_error():
+    """Return an error response unless profiling is on and the request carries the token."""
+    if not profiling.ENABLED:
+        return jsonify({'error': 'Profiling is disabled (set CAPITAL_PROFILE_TOKEN)'}), 404
+    if not PROFILER.check_token(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Invalid or missing X-Profile-Token'}), 403
+    return None
+
+
+@app.route('/api/admin/profile', methods=['GET', 'POST'])
+def api_admin_profile():
+    """Show profiling status; POST {"rate", "mode", "reset"} to change it."""
+    error = _profile_admin_error()
+    if error is not None:
+        return error
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            rate = body.get('rate')
+            PROFILER.configure(
+                rate=float(rate) if rate is not None else None,
+                mode=body.get('mode'),
+                reset=bool(body.get('reset')),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(PROFILER.status())
+
+
+@app.route('/api/admin/profile/download', methods=['GET'])
+def api_admin_profile_download():
+    """Download one endpoint's aggregated profile as .pstats or collapsed stacks."""
+    error = _profile_admin_error()
+    if error is not None:
+        return error
+    endpoint = request.args.get('endpoint', '')
+    fmt = request.args.get('format', 'pstats')
+    name = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+    if fmt == 'pstats':
+        data = PROFILER.pstats_bytes(endpoint)
+        mimetype, filename = 'application/octet-stream', f'{name}.pstats'
+    elif fmt == 'collapsed':
+        data = PROFILER.collapsed(endpoint)
+        mimetype, filename = 'text/plain', f'{name}.collapsed'
+    else:
+        return jsonify({'error': 'format must be pstats or collapsed'}), 400
+    if data is None:
+        return jsonify({'error': f'No {fmt} profile collected for {endpoint}'}), 404
+    response = Response(data, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/api/countries', methods=['GET'])
+def api_countries():
+    """List the countries in the dataset (key, display name, number of regions)."""
+    return cached_response(('countries',), lambda: CachedBody({'countries': countries()}, 200, STATIC_MAX_AGE))
+
+
+@app.route('/api/bundle', methods=['GET'])
+def api_bundle():
+    """Redirect to the current content-hashed data bundle."""
+    bundle = current_bundle()
+    response = redirect(url_for('api_bundle_hash', bundle_hash=bundle.hash), code=302)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/bundle/<bundle_hash>', methods=['GET'])
+def api_bundle_hash(bundle_hash):
+    """Serve a data bundle by hash, brotli- or gzip-encoded when the client accepts it."""
+    bundle = current_bundle()
+    if bundle.hash != bundle_hash:
+        bundle = load_bundle(bundle_hash)
+        if bundle is None:
+            return jsonify({'error': 'Unknown bundle'}), 404
+    
+    accepted = request.accept_encodings
+    if bundle.brotli is not None and accepted['br']:
+        encoding, body = 'br', bundle.brotli
+    elif accepted['gzip']:
+        encoding, body = 'gzip', bundle.gzipped
+    else:
+        encoding, body = None, bundle.body
+    # as in CachedBody, each encoding is its own representation with its own strong ETag
+    etag = f'{bundle.hash}-{encoding}' if encoding else bundle.hash
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={BUNDLE_MAX_AGE}, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 
 @app.route('/api/random', methods=['GET'])
@@ -57,7 +374,37 @@ def api_random():
     if not result:
         return jsonify({'error': 'No data for country'}), 404
     
-    return jsonify(result)
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/api/quiz', methods=['POST'])
+def api_quiz_start():
+    """Start a quiz session that draws a country's regions without repeats."""
+    body = request.get_json(silent=True)
+    country = body.get('country') if isinstance(body, dict) else None
+    country = str(country or request.args.get('country', 'us')).lower()
+    
+    quiz_id = QUIZZES.create(country)
+    if quiz_id is None:
+        return jsonify({'error': 'No data for country'}), 404
+    
+    response = jsonify({'quiz_id': quiz_id, 'country': country, 'expires_in': QUIZZES.ttl})
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 201
+
+
+@app.route('/api/quiz/<quiz_id>/next', methods=['GET'])
+def api_quiz_next(quiz_id):
+    """Draw the next region of a quiz session."""
+    result = QUIZZES.draw(quiz_id)
+    if result is None:
+        return jsonify({'error': 'Quiz not found or expired'}), 404
+    
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 @app.route('/api/lookup', methods=['GET'])
@@ -69,26 +416,112 @@ def api_lookup():
     if not state:
         return jsonify({'error': 'Missing state parameter'}), 400
     
-    capital_result = find_capital(state, country)
-    if not capital_result:
-        return jsonify({'error': 'Capital not found'}), 404
+    def build():
+        capital_result = find_capital(state, country)
+        if not capital_result:
+            return CachedBody(_not_found(state, country), 404, STATIC_MAX_AGE)
+        
+        capital = capital_result['capital']
+        version = enrichment_version(capital)
+        enriched = get_fact_with_enrichment(capital, timeout=ENRICH_DEADLINE)
+        return CachedBody(lookup_result(capital_result, enriched), 200,
+                          _enriched_max_age(enriched), capital, version)
+    
+    return cached_response(('lookup', country, normalize(state)), build)
+
+
+@app.route('/api/lookup/batch', methods=['POST'])
+def api_lookup_batch():
+    """Resolve many {country, state} pairs with one enrichment round-trip.
+    
+    Accepts a JSON list (or {"items": [...]}) and returns {"results": [...]}
+    in input order; items that fail carry their own 'error' instead of
+    failing the whole batch.
+    """
+    body = request.get_json(silent=True)
+    items = body.get('items') if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON list of {country, state} objects'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} items)'}), 400
+    
+    # resolve capitals first so all enrichment misses go upstream together
+    resolved = []
+    for item in items:
+        if not isinstance(item, dict):
+            resolved.append({'error': 'Expected an object with country and state'})
+            continue
+        country = str(item.get('country') or 'us').lower()
+        state = item.get('state') or ''
+        if not isinstance(state, str) or not state:
+            resolved.append({'error': 'Missing state parameter'})
+            continue
+        capital_result = find_capital(state, country)
+        resolved.append(capital_result or {'error': 'Capital not found'})
     
-    enriched = get_fact_with_enrichment(capital_result['capital'])
+    capitals = [r['capital'] for r in resolved if 'capital' in r]
+    enriched = get_facts_with_enrichment(capitals, timeout=ENRICH_DEADLINE)
     
-    return jsonify({
-        'state': capital_result['state'],
-        'capital': capital_result['capital'],
-        'fact': enriched.get('fact', ''),
-        'wikipedia_summary': enriched.get('wikipedia_summary', ''),
-        'source': enriched.get('source', 'local')
-    })
+    results = [
+        lookup_result(r, enriched[r['capital']]) if 'capital' in r else r
+        for r in resolved
+    ]
+    return jsonify({'results': results})
+
+
+@app.route('/api/suggest', methods=['GET'])
+def api_suggest():
+    """Typeahead: top-k states matching a partial name, in stable ranked order."""
+    country = request.args.get('country', 'us').lower()
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', '10'))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    
+    def build():
+        return CachedBody({'suggestions': suggest(query, country, limit)}, 200, STATIC_MAX_AGE)
+    
+    return cached_response(('suggest', country, normalize(query), limit), build)
+
+
+@app.route('/api/cache/status', methods=['GET'])
+def api_cache_status():
+    """Report cache warm-up progress and the time of the last refresh."""
+    if WARMER is None:
+        return jsonify({'state': 'disabled'})
+    return jsonify(WARMER.status())
 
 
 if __name__ == '__main__':
-    print('Starting Capital Quest API server on http://localhost:5000')
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Capital Quest API server.')
+    parser.add_argument('--mode', choices=['flask', 'asgi'], default='flask',
+                        help='flask: threaded Flask server (default); asgi: async server via uvicorn')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+    args = parser.parse_args()
+
+    print(f'Starting Capital Quest API server on http://localhost:{args.port}')
     print('Endpoints:')
+    print('  GET /api/countries')
+    print('  GET /api/bundle')
     print('  GET /api/capital?country=us&state=california')
     print('  GET /api/enriched?capital=Sacramento')
     print('  GET /api/random?country=us')
     print('  GET /api/lookup?country=us&state=california')
-    app.run(debug=False, port=5000)
+    if args.mode == 'asgi':
+        import asgi_app
+        asgi_app.run(port=args.port)
+    else:
+        print('  POST /api/lookup/batch')
+        print('  GET /api/suggest?country=us&q=new')
+        print('  POST /api/quiz')
+        print('  GET /api/quiz/<quiz_id>/next')
+        print('  GET /api/cache/status')
+        print('  GET /metrics')
+        if os.environ.get('CAPITAL_WARM_CACHE') == '1':
+            start_warmer()
+            print('Cache warmer started')
+        app.run(debug=False, port=args.port)
@@ -0,0 +1,198 @@
+"""
+asgi_app.py
+
+Async (ASGI) serving mode for the Capital Quest API.
+
+Exposes the same read endpoints as api_server.py with byte-identical
+JSON bodies, but Wikipedia enrichment runs on the event loop with
+non-blocking HTTP, so one process can hold thousands of slow upstream
+requests without a thread each.
+
+Endpoints:
+  GET /api/countries
+  GET /api/capital?country=us&state=California
+  GET /api/enriched?capital=Sacramento
+  GET /api/random?country=us
+  GET /api/lookup?country=us&state=california
+  GET /api/suggest?country=us&q=new&limit=10
+
+Requests are rate limited exactly as in api_server.py (see ratelimit.py).
+
+Run (requires `pip install uvicorn`):
+  python api_server.py --mode asgi
+or
+  uvicorn asgi_app:app --port 5000
+"""
+import asyncio
+import json
+import os
+from urllib.parse import parse_qsl
+
+from capital_lookup import (
+    find_capital, random_pick, get_fact_with_enrichment_async, lookup_result, did_you_mean, suggest, countries,
+)
+from ratelimit import CLIENT_LIMITER, forwarded_client, retry_after, upstream_wait
+
+ENRICH_DEADLINE = float(os.environ.get('CAPITAL_ENRICH_DEADLINE', '1.0'))
+MAX_SUGGESTIONS = 50
+
+
+def client_address(scope) -> str:
+    """The address requests are rate limited by (honours CAPITAL_TRUST_PROXY like api_server.py)."""
+    client = scope.get('client')
+    forwarded = b','.join(value for name, value in scope.get('headers', ()) if name == b'x-forwarded-for')
+    return forwarded_client(client[0] if client else '', forwarded.decode('latin-1'))
+
+
+def too_many_requests(wait: float):
+    return {'error': 'Too many requests', 'retry_after': retry_after(wait)}, 429
+
+
+def json_body(obj) -> bytes:
+    """Serialize `obj` exactly like Flask's `jsonify` (compact, sorted keys, trailing newline)."""
+    return (json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+async def api_countries(args: dict):
+    """List the countries in the dataset (key, display name, number of regions)."""
+    return {'countries': countries()}, 200
+
+
+async def api_capital(args: dict):
+    """Lookup capital for a state/region."""
+    country = args.get('country', 'us').lower()
+    state = args.get('state', '')
+
+    if not state:
+        return {'error': 'Missing state parameter'}, 400
+
+    result = find_capital(state, country)
+    if not result:
+        return {'error': 'Capital not found', 'did_you_mean': did_you_mean(state, country)}, 404
+
+    return result, 200
+
+
+async def api_enriched(args: dict):
+    """Get enriched fact (local + Wikipedia) for a capital."""
+    capital = args.get('capital', '')
+
+    if not capital:
+        return {'error': 'Missing capital parameter'}, 400
+
+    # the budget and cache checks may touch SQLite, which must not block the event loop
+    wait = await asyncio.to_thread(upstream_wait, capital)
+    if wait:
+        return too_many_requests(wait)
+
+    enriched = await get_fact_with_enrichment_async(capital, timeout=ENRICH_DEADLINE)
+    return enriched, 200
+
+
+async def api_random(args: dict):
+    """Get a random state/capital for a country."""
+    country = args.get('country', 'us').lower()
+
+    result = random_pick(country)
+    if not result:
+        return {'error': 'No data for country'}, 404
+
+    return result, 200
+
+
+async def api_lookup(args: dict):
+    """Combined endpoint: find capital + get enrichment."""
+    country = args.get('country', 'us').lower()
+    state = args.get('state', '')
+
+    if not state:
+        return {'error': 'Missing state parameter'}, 400
+
+    capital_result = find_capital(state, country)
+    if not capital_result:
+        return {'error': 'Capital not found', 'did_you_mean': did_you_mean(state, country)}, 404
+
+    enriched = await get_fact_with_enrichment_async(capital_result['capital'], timeout=ENRICH_DEADLINE)
+    return lookup_result(capital_result, enriched), 200
+
+
+async def api_suggest(args: dict):
+    """Typeahead: top-k states matching a partial name, in stable ranked order."""
+    country = args.get('country', 'us').lower()
+    try:
+        limit = int(args.get('limit', '10'))
+    except ValueError:
+        return {'error': 'limit must be an integer'}, 400
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+
+    return {'suggestions': suggest(args.get('q', ''), country, limit)}, 200
+
+
+ROUTES = {
+    '/api/countries': api_countries,
+    '/api/capital': api_capital,
+    '/api/enriched': api_enriched,
+    '/api/random': api_random,
+    '/api/lookup': api_lookup,
+    '/api/suggest': api_suggest,
+}
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get(scope['path'])
+    wait = 0
+    if handler is not None and CLIENT_LIMITER.enabled:
+        wait = await asyncio.to_thread(CLIENT_LIMITER.acquire, client_address(scope))
+    if wait:
+        payload, status = too_many_requests(wait)
+    elif handler is None:
+        payload, status = {'error': 'Not found'}, 404
+    elif scope['method'] not in ('GET', 'HEAD'):
+        payload, status = {'error': 'Method not allowed'}, 405
+    else:
+        args = {}
+        # like Flask's request.args.get: the first value wins
+        # decoded as UTF-8 like Flask, so non-ASCII names match api_server.py
+        for key, value in parse_qsl(scope['query_string'].decode('utf-8', 'replace'), keep_blank_values=True,
+                                    encoding='utf-8', errors='replace'):
+            args.setdefault(key, value)
+        payload, status = await handler(args)
+
+    body = json_body(payload)
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+        (b'access-control-allow-origin', b'*'),
+    ]
+    if status == 429:
+        # like api_server.py's 429: a refusal must never be cached by a proxy or the browser
+        headers.append((b'retry-after', str(payload['retry_after']).encode('ascii')))
+        headers.append((b'cache-control', b'no-store'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+def run(host: str = '127.0.0.1', port: int = 5000):
+    """Serve the ASGI app with uvicorn."""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('ASGI mode requires uvicorn: pip install uvicorn')
+    uvicorn.run(app, host=host, port=port, log_level='warning')
+
+
+if __name__ == '__main__':
+    print('Starting Capital Quest API server (ASGI) on http://localhost:5000')
+    run()
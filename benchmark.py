@@ -0,0 +1,288 @@
+"""
+benchmark.py
+
+Benchmarks for the lookup, enrichment and API layers, run against a local
+Wikipedia stub (wiki_stub.py) so results do not depend on the network.
+
+Modes:
+  python benchmark.py micro               # find_capital, random_pick, normalize, enrichment
+  python benchmark.py load                # every api_server endpoint via the Flask test client
+  CAPITAL_RATE_LIMIT=0 python api_server.py &
+  python benchmark.py load --url http://127.0.0.1:5000
+                                          # a running server over real sockets
+
+Every benchmark request comes from one address, so a server under test must
+run with rate limiting off (CAPITAL_RATE_LIMIT=0); the test-client mode turns
+the limiters off itself.
+
+Results are printed (or written with --output) as JSON, so runs before and
+after a change can be compared:
+  python benchmark.py micro --output before.json
+
+The enrichment cache is pointed at a temporary database, so benchmarks never
+touch capital_facts_cache.sqlite3.
+"""
+import http.client
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlencode, urlsplit
+
+import capital_enricher
+from capital_lookup import DATA, find_capital, random_pick, normalize, get_fact_with_enrichment
+from wiki_stub import StubWikipediaServer
+
+
+def _summarize(samples: list) -> dict:
+    """Latency statistics (in microseconds) for a list of durations in seconds."""
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pct(p):
+        return round(ordered[min(n - 1, int(p * n))] * 1e6, 2)
+
+    return {
+        'count': n,
+        'mean_us': round(statistics.fmean(ordered) * 1e6, 2),
+        'p50_us': pct(0.50),
+        'p90_us': pct(0.90),
+        'p99_us': pct(0.99),
+        'max_us': round(ordered[-1] * 1e6, 2),
+    }
+
+
+def _time_calls(fn, args_list: list, repeat: int) -> dict:
+    """Call fn(*args) for every args tuple, `repeat` times over, timing each call."""
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+def _reset_enrichment(stub: StubWikipediaServer, tmpdir: str):
+    """Point the enricher at the stub and an empty temporary cache."""
+    capital_enricher.STORE = None
+    capital_enricher.CACHE_BACKEND = 'sqlite'
+    capital_enricher.CACHE_DB = os.path.join(tmpdir, f'bench-{time.monotonic_ns()}.sqlite3')
+    capital_enricher.CACHE_FILE = os.path.join(tmpdir, 'bench-cache.json')
+    capital_enricher.CACHE.clear()
+    capital_enricher.NEGATIVE_CACHE.clear()
+    capital_enricher.BREAKER.record_success()
+    capital_enricher.set_client(capital_enricher.WikipediaClient(stub.api_url))
+
+
+def _query_sets() -> dict:
+    """Representative queries for each find_capital tier."""
+    exact, prefix, substring, miss = [], [], [], []
+    for country_key, states in DATA.items():
+        for state in states:
+            key = normalize(state)
+            exact.append((state, country_key))
+            prefix.append((key[:3], country_key))
+            if len(key) > 4:
+                substring.append((key[2:5], country_key))
+            miss.append((key + 'zzq', country_key))
+    # keep only queries that actually land in the intended tier
+    prefix = [(q, c) for q, c in prefix if find_capital(q, c) and normalize(find_capital(q, c)['state']) != q]
+    substring = [(q, c) for q, c in substring
+                 if find_capital(q, c) and not normalize(find_capital(q, c)['state']).startswith(q)]
+    return {'exact': exact, 'prefix': prefix, 'substring': substring, 'miss': miss}
+
+
+def run_micro(repeat: int, stub_latency: float) -> dict:
+    """Microbenchmarks for the lookup and enrichment functions."""
+    results = {}
+    for tier, queries in _query_sets().items():
+        results[f'find_capital.{tier}'] = _time_calls(find_capital, queries, repeat)
+    results['random_pick'] = _time_calls(random_pick, [(c,) for c in DATA] * 20, repeat)
+    results['normalize'] = _time_calls(normalize, [(s,) for states in DATA.values() for s in states], repeat)
+
+    capitals = list(dict.fromkeys(c for states in DATA.values() for c in states.values()))
+    with StubWikipediaServer(latency=stub_latency) as stub, tempfile.TemporaryDirectory() as tmpdir:
+        _reset_enrichment(stub, tmpdir)
+        # cold: every call misses the cache and goes to the stub
+        cold_names = [(f'{capital} {i}',) for i in range(repeat) for capital in capitals]
+        results['get_fact_with_enrichment.cold'] = _time_calls(get_fact_with_enrichment, cold_names, 1)
+        # warm: everything is already in the in-memory cache
+        for capital in capitals:
+            get_fact_with_enrichment(capital)
+        results['get_fact_with_enrichment.warm'] = _time_calls(
+            get_fact_with_enrichment, [(c,) for c in capitals], repeat)
+        results['stub_requests'] = stub.requests
+        capital_enricher.get_client().close()
+    return results
+
+
+def _prepare(send) -> dict:
+    """Create what some endpoints need first: a quiz session and the current bundle hash."""
+    status, _, body = send('POST', '/api/quiz', {'country': 'us'})
+    quiz_id = json.loads(body)['quiz_id'] if status == 201 else 'missing'
+    status, headers, _ = send('GET', '/api/bundle', {})
+    bundle_hash = (headers.get('Location') or '').rstrip('/').rsplit('/', 1)[-1] if status == 302 else 'missing'
+    return {'quiz_id': quiz_id, 'bundle_hash': bundle_hash}
+
+
+def _endpoint_requests(quiz_id: str, bundle_hash: str) -> list:
+    """(name, method, path, params or JSON body) for every api_server endpoint."""
+    requests = []
+    for country_key, states in DATA.items():
+        for state, capital in states.items():
+            requests.append(('capital', 'GET', '/api/capital', {'country': country_key, 'state': state}))
+            requests.append(('lookup', 'GET', '/api/lookup', {'country': country_key, 'state': state}))
+            requests.append(('enriched', 'GET', '/api/enriched', {'capital': capital}))
+            requests.append(('suggest', 'GET', '/api/suggest', {'country': country_key, 'q': state[:2]}))
+            requests.append(('quiz_next', 'GET', f'/api/quiz/{quiz_id}/next', {}))
+        requests.append(('random', 'GET', '/api/random', {'country': country_key}))
+        requests.append(('quiz_start', 'POST', '/api/quiz', {'country': country_key}))
+    batch = [{'country': c, 'state': s} for c, states in DATA.items() for s in list(states)[:5]]
+    requests.append(('lookup_batch', 'POST', '/api/lookup/batch', batch))
+    requests.append(('countries', 'GET', '/api/countries', {}))
+    requests.append(('bundle', 'GET', '/api/bundle', {}))
+    requests.append(('bundle_hash', 'GET', f'/api/bundle/{bundle_hash}', {}))
+    requests.append(('cache_status', 'GET', '/api/cache/status', {}))
+    return requests
+
+
+def _test_client_sender():
+    import api_server
+    import ratelimit
+    # one client sending everything would measure the limiter, not the server
+    ratelimit.CLIENT_LIMITER.rate = 0
+    ratelimit.UPSTREAM_LIMITER.rate = 0
+    api_server.RESPONSE_CACHE.clear()
+    client = api_server.app.test_client()
+
+    def send(method, path, data):
+        if method == 'POST':
+            response = client.post(path, json=data)
+        else:
+            response = client.get(path, query_string=data)
+        return response.status_code, response.headers, response.get_data()
+    return send
+
+
+def _socket_sender(base_url: str):
+    parts = urlsplit(base_url)
+    local = threading.local()
+
+    def send(method, path, data):
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        if method == 'POST':
+            conn.request('POST', path, json.dumps(data), {'Content-Type': 'application/json'})
+        else:
+            conn.request('GET', f'{path}?{urlencode(data)}')
+        response = conn.getresponse()
+        body = response.read()
+        if response.will_close:
+            conn.close()
+            local.conn = None
+        return response.status, response.headers, body
+    return send
+
+
+def run_load(url: str, concurrency: int, rounds: int, stub_latency: float, error_rate: float) -> dict:
+    """Drive every endpoint from `concurrency` threads and report per-endpoint latency."""
+    samples = {}
+    statuses = {}
+    lock = threading.Lock()
+
+    # a remote server talks to whatever upstream it was started with
+    stub_context = nullcontext() if url else StubWikipediaServer(latency=stub_latency, error_rate=error_rate)
+    with stub_context as stub, tempfile.TemporaryDirectory() as tmpdir:
+        if url:
+            send = _socket_sender(url)
+        else:
+            _reset_enrichment(stub, tmpdir)
+            send = _test_client_sender()
+        requests = _endpoint_requests(**_prepare(send)) * rounds
+        cursor = iter(range(len(requests)))
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(cursor, None)
+                if i is None:
+                    return
+                name, method, path, data = requests[i]
+                start = time.perf_counter()
+                try:
+                    status = send(method, path, data)[0]
+                except Exception:
+                    status = 'error'
+                elapsed = time.perf_counter() - start
+                with lock:
+                    samples.setdefault(name, []).append(elapsed)
+                    counts = statuses.setdefault(name, {})
+                    counts[str(status)] = counts.get(str(status), 0) + 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+        stub_requests = stub.requests if stub else None
+
+    endpoints = {
+        name: {**_summarize(values), 'statuses': statuses[name]}
+        for name, values in sorted(samples.items())
+    }
+    return {
+        'target': url or 'flask-test-client',
+        'concurrency': concurrency,
+        'requests': len(requests),
+        'wall_seconds': round(wall, 3),
+        'requests_per_second': round(len(requests) / wall, 1),
+        'stub_requests': stub_requests,
+        'endpoints': endpoints,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark Capital Quest lookup, enrichment and API.')
+    parser.add_argument('mode', choices=['micro', 'load'])
+    parser.add_argument('--repeat', type=int, default=50, help='Repetitions per microbenchmark query set')
+    parser.add_argument('--url', help='Load-test a running server at this base URL instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads in load mode')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over every endpoint request in load mode')
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='Seconds of delay per stub request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub requests that fail')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    if args.mode == 'micro':
+        results = run_micro(args.repeat, args.stub_latency)
+    else:
+        if args.url:
+            print('Note: the stub only serves the server if it was started with '
+                  'CAPITAL_WIKI_API_URL pointing at a stub (see wiki_stub.py).', file=sys.stderr)
+        results = run_load(args.url, args.concurrency, args.rounds, args.stub_latency, args.error_rate)
+
+    report = {
+        'mode': args.mode,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(args),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
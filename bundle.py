@@ -0,0 +1,190 @@
+"""
+bundle.py
+
+Builds the static data bundle for the web client: every country's regions
+and capitals, the fun facts and the cached Wikipedia summaries in one JSON
+file, so the page can run entirely client-side after a single download.
+
+Bundles are content-hashed (`capitals.<hash>.json`) and written together
+with precompressed `.gz` and, when the optional `brotli` package is
+installed, `.br` variants. `manifest.json` names the current bundle.
+api_server.py serves it at /api/bundle, which redirects to the immutable
+/api/bundle/<hash>.
+
+Usage:
+  python cache_warmer.py --once   # optional: fill the summary cache first
+  python bundle.py                # writes bundle/capitals.<hash>.json(.gz/.br)
+
+  from bundle import current_bundle
+  print(current_bundle().hash)
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+from capital_lookup import DATA, local_fact
+from capital_enricher import LRUCache, get_cached_entry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUNDLE_DIR = os.environ.get('CAPITAL_BUNDLE_DIR', 'bundle')
+BUNDLE_VERSION = 1
+HASH_RE = re.compile(r'^[0-9a-f]{16}$')
+LOADED_BUNDLES = 4  # older bundles kept in memory for clients that still ask for them
+
+
+class Bundle:
+    """One built bundle: the JSON body and its precompressed variants."""
+    __slots__ = ('hash', 'body', 'gzipped', 'brotli')
+
+    def __init__(self, body: bytes, gzipped: bytes = None, brotli_body: bytes = None):
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        self.body = body
+        self.gzipped = gzipped if gzipped is not None else gzip.compress(body, 9, mtime=0)
+        if brotli_body is None and brotli is not None:
+            brotli_body = brotli.compress(body, quality=11)
+        self.brotli = brotli_body
+
+    @property
+    def filename(self) -> str:
+        return f'capitals.{self.hash}.json'
+
+
+def bundle_payload() -> dict:
+    """Collect the dataset, fun facts and cached summaries into one dict."""
+    countries = []
+    facts = {}
+    summaries = {}
+    for key, regions in DATA.items():
+        countries.append({
+            'key': key,
+            'name': DATA.info[key]['name'],
+            'regions': [[state, capital] for state, capital in regions.items()],
+        })
+        for capital in regions.values():
+            if capital in facts:
+                continue
+            facts[capital] = local_fact(capital)
+            entry = get_cached_entry(capital, record=False)  # not a user lookup
+            if entry is not None and entry[0]:
+                summaries[capital] = entry[0]
+    return {'version': BUNDLE_VERSION, 'countries': countries, 'facts': facts, 'summaries': summaries}
+
+
+def build_bundle() -> Bundle:
+    """Serialize the current data into a Bundle (in memory)."""
+    body = json.dumps(bundle_payload(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return Bundle(body)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_bundle(output_dir: str = BUNDLE_DIR) -> Bundle:
+    """Build a bundle and write it, its compressed variants and the manifest to `output_dir`."""
+    bundle = build_bundle()
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, bundle.filename)
+    _write_atomic(path, bundle.body)
+    _write_atomic(f'{path}.gz', bundle.gzipped)
+    if bundle.brotli is not None:
+        _write_atomic(f'{path}.br', bundle.brotli)
+    manifest = {'hash': bundle.hash, 'file': bundle.filename}
+    _write_atomic(os.path.join(output_dir, 'manifest.json'), json.dumps(manifest).encode('utf-8'))
+    return bundle
+
+
+def _read_optional(path: str):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+_loaded = LRUCache(LOADED_BUNDLES)
+
+
+def load_bundle(bundle_hash: str, output_dir: str = BUNDLE_DIR):
+    """Load a previously written bundle by hash, or None if it is not on disk.
+    
+    Loaded bundles (with their compressed variants) are kept in memory, so
+    clients still on an older hash do not cost a disk read per request.
+    """
+    if not HASH_RE.match(bundle_hash):
+        return None
+    key = (output_dir, bundle_hash)
+    bundle = _loaded.get(key)
+    if bundle is not None:
+        return bundle
+    path = os.path.join(output_dir, f'capitals.{bundle_hash}.json')
+    body = _read_optional(path)
+    if body is None:
+        return None
+    bundle = Bundle(body, _read_optional(f'{path}.gz'), _read_optional(f'{path}.br'))
+    _loaded.put(key, bundle)
+    return bundle
+
+
+_current = None
+_current_mtime = None
+_current_lock = threading.Lock()
+
+
+def current_bundle(output_dir: str = BUNDLE_DIR, refresh: bool = False) -> Bundle:
+    """Return the bundle named by `output_dir`/manifest.json.
+
+    The manifest is re-read when it changes, so running `python bundle.py`
+    publishes a new bundle without restarting the server. Without a built
+    bundle, one is built in memory from the current data. `refresh` forces
+    a reload (or rebuild), e.g. after the dataset was reloaded.
+    """
+    global _current, _current_mtime
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _current_lock:
+        if _current is not None and mtime == _current_mtime and not refresh:
+            return _current
+        bundle = None
+        if mtime is not None:
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    bundle = load_bundle(json.load(f)['hash'], output_dir)
+            except (OSError, ValueError, KeyError) as e:
+                print(f'Warning: Could not load bundle manifest: {e}')
+        if bundle is None:
+            bundle = build_bundle()
+        _current, _current_mtime = bundle, mtime
+        return bundle
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from capital_enricher import load_cache
+
+    parser = argparse.ArgumentParser(description='Build the content-hashed data bundle for the web client.')
+    parser.add_argument('--output', '-o', default=BUNDLE_DIR, help='Output directory')
+    args = parser.parse_args()
+
+    load_cache()
+    bundle = write_bundle(args.output)
+    sizes = f'{len(bundle.body)} bytes, gzip {len(bundle.gzipped)}'
+    if bundle.brotli is not None:
+        sizes += f', brotli {len(bundle.brotli)}'
+    else:
+        sizes += ' (install brotli for a .br variant)'
+    print(f'Wrote {os.path.join(args.output, bundle.filename)} ({sizes})')
@@ -0,0 +1,184 @@
+"""
+cache_store.py
+
+Persistent backends for the Wikipedia summary cache used by capital_enricher.py.
+
+Each entry is stored as (summary, fetched_at) where `fetched_at` is a Unix
+timestamp. Two backends share the same small interface (load/get/fetched_at/put/put_many):
+
+  - SQLiteCacheStore: the default. One row per title in a WAL-mode database,
+    so every write is an O(1) upsert and several processes (Flask threads,
+    gunicorn workers, the CLI) can read and write the same file safely.
+  - JSONCacheStore: the legacy `capital_facts_cache.json` format. Writes
+    rewrite the whole file, but atomically (temp file + rename).
+
+Usage:
+  from cache_store import open_store
+  store = open_store('sqlite', 'capital_facts_cache.sqlite3')
+  store.put('Jaipur', 'Jaipur is the capital of Rajasthan.')
+  print(store.get('Jaipur'))
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class SQLiteCacheStore:
+    """Cache entries in a SQLite database using write-ahead logging."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # connections must not be shared across fork(); reopen in a child
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS summaries ('
+                'title TEXT PRIMARY KEY, summary TEXT NOT NULL, fetched_at REAL NOT NULL)'
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def load(self) -> dict:
+        """Return every entry as {title: (summary, fetched_at)}."""
+        with self._lock:
+            rows = self._connection().execute('SELECT title, summary, fetched_at FROM summaries').fetchall()
+        return {title: (summary, fetched_at) for title, summary, fetched_at in rows}
+
+    def get(self, title: str):
+        """Return (summary, fetched_at) for `title`, or None if absent."""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT summary, fetched_at FROM summaries WHERE title = ?', (title,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def fetched_at(self, title: str):
+        """Return when `title` was fetched, or None if absent (skips reading the summary)."""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT fetched_at FROM summaries WHERE title = ?', (title,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, title: str, summary: str, fetched_at: float = None):
+        """Insert or replace one entry."""
+        self.put_many({title: (summary, fetched_at)})
+
+    def put_many(self, entries: dict):
+        """Insert or replace {title: (summary, fetched_at)} in one transaction."""
+        now = time.time()
+        rows = [(title, summary, fetched_at or now) for title, (summary, fetched_at) in entries.items()]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT OR REPLACE INTO summaries (title, summary, fetched_at) VALUES (?, ?, ?)', rows
+                )
+
+    def import_json(self, json_path: str) -> int:
+        """Copy entries from a legacy JSON cache file; returns the number imported."""
+        entries = JSONCacheStore(json_path).load()
+        self.put_many(entries)
+        return len(entries)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class JSONCacheStore:
+    """Cache entries in a single JSON file (the original on-disk format).
+
+    Legacy files map title -> summary; those entries take the file's
+    modification time as their `fetched_at`. New writes store
+    {"summary": ..., "fetched_at": ...} objects.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """Return every entry as {title: (summary, fetched_at)}."""
+        with self._lock:
+            return self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        mtime = os.path.getmtime(self.path)
+        entries = {}
+        for title, value in raw.items():
+            if isinstance(value, dict):
+                entries[title] = (value.get('summary', ''), value.get('fetched_at', mtime))
+            else:
+                entries[title] = (value, mtime)
+        return entries
+
+    def get(self, title: str):
+        """Return (summary, fetched_at) for `title`, or None if absent."""
+        return self.load().get(title)
+
+    def fetched_at(self, title: str):
+        """Return when `title` was fetched, or None if absent."""
+        entry = self.get(title)
+        return entry[1] if entry is not None else None
+
+    def put(self, title: str, summary: str, fetched_at: float = None):
+        """Insert or replace one entry (rewrites the file)."""
+        self.put_many({title: (summary, fetched_at)})
+
+    def put_many(self, entries: dict):
+        """Merge {title: (summary, fetched_at)} into the file and rewrite it atomically."""
+        now = time.time()
+        with self._lock:
+            merged = self._read()
+            for title, (summary, fetched_at) in entries.items():
+                merged[title] = (summary, fetched_at or now)
+            data = {
+                title: {'summary': summary, 'fetched_at': fetched_at}
+                for title, (summary, fetched_at) in merged.items()
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SQLiteCacheStore,
+    'json': JSONCacheStore,
+}
+
+
+def open_store(backend: str, path: str):
+    """Create a cache store for `backend` ('sqlite' or 'json') at `path`."""
+    try:
+        return BACKENDS[backend](path)
+    except KeyError:
+        raise ValueError(f'Unknown cache backend: {backend!r} (expected one of {sorted(BACKENDS)})')
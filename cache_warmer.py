@@ -0,0 +1,191 @@
+"""
+cache_warmer.py
+
+Background warm-up and TTL refresh of Wikipedia summaries for every capital
+in the dataset (capital_lookup.DATA), so visitors never pay the first-fetch latency.
+
+At start-up every capital without a cached summary is fetched in batches of
+up to BATCH_SIZE titles, with at most `concurrency` batches in flight. After
+that the warmer wakes up every `check_interval` seconds (with jitter) and
+re-fetches summaries older than `ttl`. Upstream HTTP requests (each batch
+may take several, as extracts are paged) are capped at `max_rps` per second.
+
+Usage:
+  python cache_warmer.py            # warm up, then keep refreshing
+  python cache_warmer.py --once     # warm up and refresh stale entries once, then exit
+
+  from cache_warmer import CacheWarmer
+  warmer = CacheWarmer()
+  warmer.start()
+  print(warmer.status())
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from capital_lookup import DATA
+from capital_enricher import (
+    BATCH_SIZE, CACHE_TTL, get_cached_entry, load_cache, upstream_throttle,
+    fetch_wikipedia_summaries, refresh_wikipedia_summaries,
+)
+
+
+def all_capitals() -> list:
+    """Return every distinct capital in DATA, in dataset order."""
+    capitals = {}
+    for country_key in DATA:
+        for capital in DATA[country_key].values():
+            capitals[capital] = True
+    return list(capitals)
+
+
+class WarmupPacer:
+    """Space acquisitions at most `rate` per second apart, sleeping the caller (shared across threads)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CacheWarmer:
+    """Pre-warm and periodically refresh cached capital summaries."""
+
+    def __init__(self, ttl: float = CACHE_TTL, concurrency: int = 2, max_rps: float = 1.0,
+                 check_interval: float = 3600, jitter: float = 0.1):
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.check_interval = check_interval
+        self.jitter = jitter
+        self._pacer = WarmupPacer(max_rps)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {
+            'state': 'idle',
+            'total': 0,
+            'warmed': 0,
+            'failed': 0,
+            'warmup_started_at': None,
+            'warmup_finished_at': None,
+            'last_refresh_at': None,
+            'last_refresh_count': 0,
+            'next_refresh_at': None,
+        }
+
+    def start(self):
+        """Run warm-up and the refresh loop on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Ask the background thread to stop and wait for it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._update(state='stopped', next_refresh_at=None)
+
+    def status(self) -> dict:
+        """Return a snapshot of warm-up progress and refresh times."""
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _run(self):
+        self.warm_up()
+        while not self._stop.is_set():
+            delay = self.check_interval * (1 + random.uniform(-self.jitter, self.jitter))
+            self._update(state='idle', next_refresh_at=time.time() + delay)
+            if self._stop.wait(delay):
+                break
+            self.refresh_stale()
+
+    def warm_up(self):
+        """Fetch every capital that has no cached summary yet."""
+        capitals = all_capitals()
+        # record=False: warming is not a user lookup, so it stays out of the cache metrics
+        missing = [c for c in capitals if get_cached_entry(c, record=False) is None]
+        self._update(
+            state='warming', total=len(capitals), warmed=len(capitals) - len(missing), failed=0,
+            warmup_started_at=time.time(), warmup_finished_at=None,
+        )
+        self._run_batches(missing, partial(fetch_wikipedia_summaries, record=False), count_progress=True)
+        self._update(warmup_finished_at=time.time())
+
+    def refresh_stale(self) -> int:
+        """Re-fetch capitals whose summaries are older than the (jittered) TTL."""
+        self._update(state='refreshing')
+        now = time.time()
+        stale = []
+        for capital in all_capitals():
+            entry = get_cached_entry(capital, record=False)
+            # jitter each entry's TTL so refreshes spread out instead of expiring together
+            ttl = self.ttl * (1 - random.uniform(0, self.jitter))
+            if entry is None or (entry[0] and now - entry[1] > ttl):
+                stale.append(capital)
+        self._run_batches(stale, refresh_wikipedia_summaries)
+        self._update(last_refresh_at=time.time(), last_refresh_count=len(stale))
+        return len(stale)
+
+    def _run_batches(self, capitals: list, fetch, count_progress: bool = False):
+        batches = [capitals[i:i + BATCH_SIZE] for i in range(0, len(capitals), BATCH_SIZE)]
+
+        def run(batch):
+            if self._stop.is_set():
+                return
+            with upstream_throttle(self._pacer.acquire):
+                summaries = fetch(batch)
+            if count_progress:
+                ok = sum(1 for c in batch if summaries.get(c))
+                with self._lock:
+                    self._status['warmed'] += ok
+                    self._status['failed'] += len(batch) - ok
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='warm') as pool:
+            list(pool.map(run, batches))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Warm and refresh the capital summary cache.')
+    parser.add_argument('--once', action='store_true', help='Warm up and refresh stale entries once, then exit')
+    parser.add_argument('--ttl', type=float, default=CACHE_TTL, help='Seconds before a summary is refreshed')
+    parser.add_argument('--interval', type=float, default=3600, help='Seconds between refresh passes')
+    parser.add_argument('--concurrency', type=int, default=2, help='Batches fetched in parallel')
+    parser.add_argument('--rps', type=float, default=1.0, help='Maximum upstream requests per second')
+    args = parser.parse_args()
+
+    load_cache()
+    warmer = CacheWarmer(ttl=args.ttl, concurrency=args.concurrency, max_rps=args.rps,
+                         check_interval=args.interval)
+    if args.once:
+        warmer.warm_up()
+        refreshed = warmer.refresh_stale()
+        status = warmer.status()
+        print(f"Warmed {status['warmed']}/{status['total']} capitals "
+              f"({status['failed']} failed), refreshed {refreshed} stale entries.")
+    else:
+        warmer.start()
+        try:
+            while True:
+                time.sleep(60)
+                print(warmer.status())
+        except KeyboardInterrupt:
+            warmer.stop()
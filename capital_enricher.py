@@ -4,102 +4,906 @@ capital_enricher.py
 Enriches capital city facts by fetching summaries from Wikipedia using the MediaWiki API.
 Includes caching to avoid redundant requests and child-friendly summary extraction.
 
+Summaries come from the live API by default. Set CAPITAL_ENRICH_SOURCE=offline
+to read them from a local index built by offline_extracts.py instead
+(CAPITAL_OFFLINE_INDEX, default capital_extracts.sqlite3).
+
 Usage:
   from capital_enricher import get_enriched_fact
   fact_with_summary = get_enriched_fact('Jaipur')
   print(fact_with_summary)
 """
+import asyncio
+import http.client
 import json
 import os
-from urllib.request import urlopen
+import ssl
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import urlencode, urlsplit
 from urllib.error import URLError
 import textwrap
+import time
+
+import metrics
+from cache_store import open_store
+from offline_extracts import OfflineExtractsClient, AsyncOfflineExtractsClient
 
 CACHE_FILE = 'capital_facts_cache.json'
-CACHE = {}
+CACHE_DB = 'capital_facts_cache.sqlite3'
+CACHE_BACKEND = os.environ.get('CAPITAL_CACHE_BACKEND', 'sqlite')  # 'sqlite' or 'json'
+CACHE_MAX_ENTRIES = int(os.environ.get('CAPITAL_CACHE_MAX_ENTRIES', '2048'))
+NEGATIVE_TTL = float(os.environ.get('CAPITAL_NEGATIVE_TTL', '300'))  # seconds
+CACHE_TTL = float(os.environ.get('CAPITAL_CACHE_TTL', str(7 * 24 * 3600)))  # seconds before a summary is stale
+ENRICH_WORKERS = int(os.environ.get('CAPITAL_ENRICH_WORKERS', '8'))
+STORE = None
+
+API_URL = os.environ.get('CAPITAL_WIKI_API_URL', 'https://en.wikipedia.org/w/api.php')
+ENRICH_SOURCE = os.environ.get('CAPITAL_ENRICH_SOURCE', 'api')  # 'api' or 'offline'
+OFFLINE_INDEX = os.environ.get('CAPITAL_OFFLINE_INDEX', 'capital_extracts.sqlite3')
+BATCH_SIZE = 50  # MediaWiki limit on titles per query for regular clients
+USER_AGENT = 'CapitalQuest/1.0 (educational capital city quiz)'
+
+
+class LRUCache:
+    """Thread-safe, bounded mapping that evicts the least recently used key."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def update(self, items: dict):
+        for key, value in items.items():
+            self.put(key, value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def items(self) -> list:
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Coalesce concurrent work on the same key into a single call.
+
+    The first caller to `claim` a key becomes its leader and must call
+    `finish`; everyone else gets the same in-flight call and waits on it.
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+
+        def wait(self):
+            self.done.wait()
+            return self.result
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """Return (call, is_leader) for `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = SingleFlight.Call()
+            return call, True
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def finish(self, key, call, result):
+        """Publish the leader's `result` to all waiters and release `key`."""
+        with self._lock:
+            self._calls.pop(key, None)
+        call.result = result
+        call.done.set()
+
+
+class CircuitBreaker:
+    """Stop calling upstream after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    `allow()` returns False for `reset_timeout` seconds. Then a single probe
+    request is let through: success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# in-process layers in front of the persistent store
+CACHE = LRUCache(CACHE_MAX_ENTRIES)           # title -> (summary, fetched_at)
+NEGATIVE_CACHE = LRUCache(CACHE_MAX_ENTRIES)  # title -> expiry time of a failed lookup
+_FLIGHTS = SingleFlight()
+BREAKER = CircuitBreaker(
+    failure_threshold=int(os.environ.get('CAPITAL_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.environ.get('CAPITAL_BREAKER_RESET', '30')),
+)
+
+CACHE_LOOKUPS = metrics.Counter(
+    'capital_enrichment_cache_lookups_total',
+    'Summary cache lookups by result (hit, store_hit, negative_hit, miss).', ['result'])
+UPSTREAM_REQUESTS = metrics.Counter(
+    'capital_upstream_requests_total',
+    'Wikipedia API calls by outcome (success, failure, short_circuit by the circuit breaker).', ['outcome'])
+UPSTREAM_LATENCY = metrics.Histogram(
+    'capital_upstream_request_duration_seconds', 'Latency of Wikipedia API calls, including retries and continuations.')
+metrics.Gauge('capital_enrichment_cache_entries', 'Summaries held in the in-memory LRU.', lambda: len(CACHE))
+metrics.Gauge('capital_upstream_breaker_open', '1 while the circuit breaker blocks upstream calls.',
+              lambda: 0 if BREAKER.state == 'closed' else 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _background() -> ThreadPoolExecutor:
+    """Return the shared pool used for deadline-bounded and background fetches."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix='enrich')
+        return _executor
+
+
+def get_store():
+    """Return the persistent cache store, opening it on first use.
+    
+    The SQLite store imports an existing legacy JSON cache the first time
+    it is created.
+    """
+    global STORE
+    if STORE is None:
+        if CACHE_BACKEND == 'json':
+            STORE = open_store('json', CACHE_FILE)
+        else:
+            fresh = not os.path.exists(CACHE_DB)
+            STORE = open_store(CACHE_BACKEND, CACHE_DB)
+            if fresh and os.path.exists(CACHE_FILE):
+                try:
+                    STORE.import_json(CACHE_FILE)
+                except Exception as e:
+                    print(f'Warning: Could not import {CACHE_FILE}: {e}')
+    return STORE
 
 
 def load_cache():
-    """Load cached Wikipedia summaries from disk."""
+    """Load cached Wikipedia summaries from disk (newest CACHE_MAX_ENTRIES)."""
     global CACHE
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                CACHE = json.load(f)
-        except Exception as e:
-            print(f'Warning: Could not load cache: {e}')
-            CACHE = {}
+    cache = LRUCache(CACHE_MAX_ENTRIES)
+    try:
+        entries = get_store().load()
+        for title, entry in sorted(entries.items(), key=lambda item: item[1][1]):
+            cache.put(title, entry)
+    except Exception as e:
+        print(f'Warning: Could not load cache: {e}')
+    CACHE = cache
 
 
 def save_cache():
-    """Save cached Wikipedia summaries to disk."""
+    """Save cached Wikipedia summaries to disk.
+    
+    Entries are already written one at a time as they are fetched; this
+    flushes the in-memory CACHE in a single transaction.
+    """
+    try:
+        get_store().put_many(dict(CACHE.items()))
+    except Exception as e:
+        print(f'Warning: Could not save cache: {e}')
+
+
+def _cache_entry(city_name: str, record: bool = True):
+    """Return the cached (summary, fetched_at) for `city_name`, or None on a miss.
+    
+    Checks the in-memory LRU, then the persistent store, then unexpired
+    negative entries (which yield an empty summary). The store comes first
+    so a recent failed refresh never hides a stale summary the LRU evicted;
+    the negative entry still holds off further refreshes. Internal re-checks
+    pass `record=False` so each request counts once in the metrics.
+    """
+    record = record and metrics.ENABLED
+    entry = CACHE.get(city_name)
+    if entry is not None:
+        if record:
+            CACHE_LOOKUPS.labels('hit').inc()
+        return entry
+    try:
+        entry = get_store().get(city_name)
+    except Exception:
+        entry = None
+    if entry is not None:
+        if record:
+            CACHE_LOOKUPS.labels('store_hit').inc()
+        CACHE.put(city_name, entry)
+        return entry
+    now = time.time()
+    expires = NEGATIVE_CACHE.get(city_name)
+    if expires is not None:
+        if expires > now:
+            if record:
+                CACHE_LOOKUPS.labels('negative_hit').inc()
+            return ('', now)
+        NEGATIVE_CACHE.pop(city_name)
+    if record:
+        CACHE_LOOKUPS.labels('miss').inc()
+    return None
+
+
+def _cache_get(city_name: str, record: bool = True):
+    """Return the cached summary for `city_name`, or None on a miss."""
+    entry = _cache_entry(city_name, record)
+    return entry[0] if entry is not None else None
+
+
+def _cache_put(city_name: str, summary: str):
+    """Record a fetched summary in memory and append it to the persistent store."""
+    _cache_put_many({city_name: summary})
+
+
+def _cache_put_many(summaries: dict):
+    """Record several fetched summaries, written to the store in one transaction."""
+    now = time.time()
+    entries = {title: (summary, now) for title, summary in summaries.items()}
+    CACHE.update(entries)
+    for title in summaries:
+        NEGATIVE_CACHE.pop(title)
     try:
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(CACHE, f, ensure_ascii=False, indent=2)
+        get_store().put_many(entries)
     except Exception as e:
         print(f'Warning: Could not save cache: {e}')
 
 
-def fetch_wikipedia_summary(city_name: str, max_length: int = 200) -> str:
+def _cache_negative(city_name: str):
+    """Remember a failed or empty lookup for NEGATIVE_TTL seconds."""
+    NEGATIVE_CACHE.put(city_name, time.time() + NEGATIVE_TTL)
+
+
+def _trim_summary(extract: str, max_length: int) -> str:
+    """Take the first sentence(s) of `extract` that fit within `max_length`."""
+    sentences = extract.split('. ')
+    summary = ''
+    for sent in sentences:
+        if len(summary) + len(sent) <= max_length:
+            summary += sent + '. '
+        else:
+            break
+    
+    summary = summary.strip()
+    if len(summary) > max_length:
+        summary = summary[:max_length].rsplit(' ', 1)[0] + '...'
+    return summary
+
+
+_THROTTLE = threading.local()
+
+
+@contextmanager
+def upstream_throttle(acquire):
+    """Call `acquire()` before every upstream HTTP request this thread makes inside the block.
+    
+    Used by cache_warmer.py, so its rate cap counts requests (including
+    `continue` pages) rather than batches.
+    """
+    previous = getattr(_THROTTLE, 'acquire', None)
+    _THROTTLE.acquire = acquire
+    try:
+        yield
+    finally:
+        _THROTTLE.acquire = previous
+
+
+class WikipediaClient:
+    """
+    Reusable MediaWiki client with pooled keep-alive connections.
+    
+    Titles are URL-encoded and sent up to BATCH_SIZE per query; the
+    `normalized` and `redirects` sections of each response are used to map
+    page titles back to the names the caller asked for. Point `api_url` at a
+    local stub server to exercise it without network access.
+    """
+
+    def __init__(self, api_url: str = API_URL, timeout: float = 5, max_idle: int = 4):
+        parts = urlsplit(api_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def query_extracts(self, titles: list) -> dict:
+        """
+        Fetch intro extracts for `titles`, BATCH_SIZE titles per request.
+        
+        Returns {requested_title: extract}; titles without a page (or
+        without an extract) map to an empty string.
+        """
+        results = {}
+        for start in range(0, len(titles), BATCH_SIZE):
+            results.update(self._query_chunk(titles[start:start + BATCH_SIZE]))
+        return results
+
+    def _query_chunk(self, titles: list) -> dict:
+        params = _extracts_params(titles)
+        by_title = {}
+        aliases = {}
+        cont = {}
+        while True:
+            # extracts are paged (`continue`) when a chunk exceeds exlimit
+            cont = _collect_extracts(self.get_json({**params, **cont}), by_title, aliases)
+            if not cont:
+                break
+        
+        return {title: by_title.get(_resolve_alias(aliases, title), '') for title in titles}
+
+    def get_json(self, params: dict) -> dict:
+        """GET `params` against the API endpoint and decode the JSON body."""
+        throttle = getattr(_THROTTLE, 'acquire', None)
+        if throttle is not None:
+            throttle()
+        url = f'{self.path}?{urlencode(params)}'
+        conn, reused = self._acquire()
+        try:
+            try:
+                response = self._request(conn, url)
+            except (http.client.RemoteDisconnected, ConnectionError):
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive connection; retry once
+                conn.close()
+                conn = self._connect()
+                response = self._request(conn, url)
+            body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.status != 200:
+            conn.close()
+            raise URLError(f'HTTP {response.status} from {self.host}')
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return json.loads(body.decode('utf-8'))
+
+    def close(self):
+        """Close all idle pooled connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _request(self, conn, url: str):
+        conn.request('GET', url, headers={'User-Agent': USER_AGENT, 'Accept': 'application/json'})
+        return conn.getresponse()
+
+    def _connect(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+def _extracts_params(titles: list) -> dict:
+    """Query parameters for an intro-extracts request covering `titles`."""
+    return {
+        'action': 'query',
+        'titles': '|'.join(titles),
+        'prop': 'extracts',
+        'exintro': 'true',
+        'explaintext': 'true',
+        'exlimit': 'max',
+        'redirects': '1',
+        'format': 'json',
+    }
+
+
+def _collect_extracts(data: dict, by_title: dict, aliases: dict):
+    """Merge one extracts response into `by_title`/`aliases`; return its `continue` params."""
+    query = data.get('query', {})
+    for item in query.get('normalized', []) + query.get('redirects', []):
+        aliases[item['from']] = item['to']
+    for page in query.get('pages', {}).values():
+        if page.get('extract'):
+            by_title[page['title']] = page['extract']
+    return data.get('continue')
+
+
+def _resolve_alias(aliases: dict, title: str) -> str:
+    """Follow normalized/redirect mappings from a requested title to its page title."""
+    seen = set()
+    while title in aliases and title not in seen:
+        seen.add(title)
+        title = aliases[title]
+    return title
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> WikipediaClient:
+    """Return the shared client for ENRICH_SOURCE, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OfflineExtractsClient(OFFLINE_INDEX) if ENRICH_SOURCE == 'offline' else WikipediaClient()
+        return _client
+
+
+def set_client(client: WikipediaClient):
+    """Replace the shared client (e.g. with one pointed at a stub server)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = client
+
+
+class AsyncWikipediaClient:
+    """
+    asyncio counterpart of WikipediaClient for the ASGI server.
+    
+    Uses non-blocking sockets (asyncio streams) with a pool of keep-alive
+    connections, so thousands of slow upstream requests can be in flight
+    without holding a thread each. Must be used from a single event loop.
+    """
+
+    def __init__(self, api_url: str = API_URL, timeout: float = 5, max_idle: int = 16):
+        parts = urlsplit(api_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self.loop = None
+
+    async def query_extracts(self, titles: list) -> dict:
+        """Async form of `WikipediaClient.query_extracts`."""
+        results = {}
+        for start in range(0, len(titles), BATCH_SIZE):
+            chunk = titles[start:start + BATCH_SIZE]
+            params = _extracts_params(chunk)
+            by_title = {}
+            aliases = {}
+            cont = {}
+            while True:
+                cont = _collect_extracts(await self.get_json({**params, **cont}), by_title, aliases)
+                if not cont:
+                    break
+            results.update((title, by_title.get(_resolve_alias(aliases, title), '')) for title in chunk)
+        return results
+
+    async def get_json(self, params: dict) -> dict:
+        """GET `params` against the API endpoint and decode the JSON body."""
+        request = (
+            f'GET {self.path}?{urlencode(params)} HTTP/1.1\r\n'
+            f'Host: {self.host}\r\n'
+            f'User-Agent: {USER_AGENT}\r\n'
+            'Accept: application/json\r\n'
+            'Connection: keep-alive\r\n\r\n'
+        ).encode('ascii')
+        reused = bool(self._idle)
+        reader, writer = self._idle.pop() if reused else await self._connect()
+        try:
+            try:
+                status, keep_alive, body = await asyncio.wait_for(
+                    self._roundtrip(reader, writer, request), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive connection; retry once
+                writer.close()
+                reader, writer = await self._connect()
+                status, keep_alive, body = await asyncio.wait_for(
+                    self._roundtrip(reader, writer, request), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+        if status != 200:
+            writer.close()
+            raise URLError(f'HTTP {status} from {self.host}')
+        if keep_alive and len(self._idle) < self.max_idle:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return json.loads(body.decode('utf-8'))
+
+    async def close(self):
+        """Close all idle pooled connections."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    async def _connect(self):
+        ssl_context = ssl.create_default_context() if self.scheme == 'https' else None
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context), self.timeout)
+
+    @staticmethod
+    async def _roundtrip(reader, writer, request: bytes):
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    # skip trailers
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+            keep_alive = headers.get('connection', '').lower() != 'close'
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+            keep_alive = headers.get('connection', '').lower() != 'close'
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, keep_alive, body
+
+
+_async_client = None
+
+
+def get_async_client() -> AsyncWikipediaClient:
+    """Return the async client for ENRICH_SOURCE on the running event loop."""
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.loop is not loop:
+        if ENRICH_SOURCE == 'offline':
+            _async_client = AsyncOfflineExtractsClient(OFFLINE_INDEX)
+        else:
+            _async_client = AsyncWikipediaClient()
+        _async_client.loop = loop
+    return _async_client
+
+
+def set_async_client(client: AsyncWikipediaClient):
+    """Replace the async client used by the running event loop."""
+    global _async_client
+    client.loop = asyncio.get_running_loop()
+    _async_client = client
+
+
+def fetch_wikipedia_summary(city_name: str, max_length: int = 200, timeout: float = None) -> str:
     """
     Fetch a summary of a city from Wikipedia using the MediaWiki API.
     
     Returns a short, child-friendly summary or empty string if unavailable.
-    Results are cached in CACHE and on disk.
+    Results are cached in CACHE and in the persistent store (see cache_store.py);
+    failures are remembered for NEGATIVE_TTL seconds, and concurrent misses
+    for the same city share one upstream request.
+    
+    Summaries older than CACHE_TTL are returned as-is and refreshed in the
+    background. With `timeout`, a miss waits at most that many seconds and
+    then returns '' while the fetch finishes in the background.
     """
     # check cache first
-    if city_name in CACHE:
-        return CACHE[city_name]
+    entry = _cache_entry(city_name)
+    if entry is not None:
+        _maybe_refresh(city_name, entry, max_length)
+        return entry[0]
     
+    if timeout is None:
+        return _fetch_coalesced(city_name, max_length)
+    future = _background().submit(_fetch_coalesced, city_name, max_length)
     try:
-        # Wikipedia API endpoint
-        url = (
-            f'https://en.wikipedia.org/w/api.php?'
-            f'action=query&titles={city_name}&prop=extracts&exintro=true&'
-            f'explaintext=true&format=json'
-        )
-        with urlopen(url, timeout=5) as response:
-            data = json.loads(response.read().decode('utf-8'))
-        
-        # extract text from response
-        pages = data.get('query', {}).get('pages', {})
-        page_id = list(pages.keys())[0] if pages else None
-        if not page_id:
-            return ''
-        
-        extract = pages[page_id].get('extract', '').strip()
-        if not extract:
-            return ''
-        
-        # take first sentence(s) up to max_length
-        sentences = extract.split('. ')
-        summary = ''
-        for sent in sentences:
-            if len(summary) + len(sent) <= max_length:
-                summary += sent + '. '
-            else:
-                break
-        
-        summary = summary.strip()
-        if len(summary) > max_length:
-            summary = summary[:max_length].rsplit(' ', 1)[0] + '...'
-        
-        # cache it
-        CACHE[city_name] = summary
-        save_cache()
-        return summary
-    except (URLError, json.JSONDecodeError, KeyError, IndexError, Exception) as e:
-        # silently fail (network error, parsing, etc.)
+        return future.result(timeout)
+    except FutureTimeout:
         return ''
 
 
-def get_enriched_fact(city_name: str, base_fact: str = '') -> dict:
+def fetch_wikipedia_summaries(city_names, max_length: int = 200, timeout: float = None,
+                              record: bool = True) -> dict:
+    """
+    Fetch summaries for many cities with as few MediaWiki requests as possible.
+    
+    Cached cities are answered locally; misses are grouped into multi-title
+    queries of up to BATCH_SIZE titles each. Returns {city_name: summary},
+    with an empty string for cities that could not be fetched (or were not
+    fetched within `timeout` seconds). `record=False` keeps the cache checks
+    out of the metrics (for background callers such as the warmer).
+    """
+    if timeout is not None:
+        future = _background().submit(fetch_wikipedia_summaries, city_names, max_length, None, record)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            return {city: _cache_get(city, record=False) or '' for city in city_names}
+    
+    results = {}
+    owned = {}
+    waiting = {}
+    for city in city_names:
+        if city in results or city in owned or city in waiting:
+            continue
+        entry = _cache_entry(city, record)
+        if entry is not None:
+            _maybe_refresh(city, entry, max_length)
+            results[city] = entry[0]
+            continue
+        call, leader = _FLIGHTS.claim(city)
+        if leader:
+            owned[city] = call
+        else:
+            waiting[city] = call
+    
+    fetched = {}
+    try:
+        fetched = _fetch_and_cache(list(owned), max_length)
+    finally:
+        for city, call in owned.items():
+            _FLIGHTS.finish(city, call, fetched.get(city, ''))
+    
+    results.update(fetched)
+    for city, call in waiting.items():
+        results[city] = call.wait()
+    return results
+
+
+def refresh_wikipedia_summaries(city_names, max_length: int = 200) -> dict:
+    """
+    Re-fetch summaries for `city_names` upstream, ignoring what is cached.
+    
+    Cities already being fetched by another caller are skipped. Returns
+    {city_name: summary} for the cities this call fetched; a failed
+    refresh keeps the previously cached summary.
+    """
+    owned = {}
+    for city in dict.fromkeys(city_names):
+        call, leader = _FLIGHTS.claim(city)
+        if leader:
+            owned[city] = call
+    fetched = {}
+    try:
+        fetched = _fetch_and_cache(list(owned), max_length, force=True)
+    finally:
+        for city, call in owned.items():
+            _FLIGHTS.finish(city, call, fetched.get(city, ''))
+    return fetched
+
+
+def cache_version(city_name: str):
+    """
+    Return a token that changes whenever the cached summary for `city_name` does.
+    
+    This is the entry's fetch time, or None when nothing is cached. With the
+    SQLite backend the store is shared by every worker process, so the newer
+    of the LRU and store fetch times is used: a summary another worker
+    refreshed invalidates this worker's responses too, and the stale LRU copy
+    is dropped so the next read loads the new one. That costs one indexed
+    read per check; the JSON backend only reads the LRU.
+    """
+    entry = CACHE.get(city_name)
+    version = entry[1] if entry is not None else None
+    if CACHE_BACKEND != 'sqlite':
+        return version
+    try:
+        stored = get_store().fetched_at(city_name)
+    except Exception:
+        return version
+    if stored is not None and (version is None or stored > version):
+        CACHE.pop(city_name)
+        return stored
+    return version
+
+
+def get_cached_entry(city_name: str, record: bool = True):
+    """Return the cached (summary, fetched_at) for `city_name`, or None.
+    
+    Pass `record=False` for checks that should not count in the cache metrics.
+    """
+    return _cache_entry(city_name, record)
+
+
+def _fetch_coalesced(city_name: str, max_length: int, force: bool = False) -> str:
+    """Fetch one city upstream, sharing the request with concurrent callers."""
+    call, leader = _FLIGHTS.claim(city_name)
+    if not leader:
+        return call.wait()
+    summary = ''
+    try:
+        summary = _fetch_and_cache([city_name], max_length, force).get(city_name, '')
+    finally:
+        _FLIGHTS.finish(city_name, call, summary)
+    return summary
+
+
+def _maybe_refresh(city_name: str, entry: tuple, max_length: int):
+    """Schedule a background refresh if `entry` is older than CACHE_TTL.
+    
+    Skipped while a fetch for the city is already in flight or a recent
+    refresh attempt failed (its negative entry has not expired yet).
+    """
+    summary, fetched_at = entry
+    now = time.time()
+    if not summary or now - fetched_at <= CACHE_TTL:
+        return
+    if _FLIGHTS.in_flight(city_name) or NEGATIVE_CACHE.get(city_name, 0) > now:
+        return
+    _background().submit(_fetch_coalesced, city_name, max_length, True)
+
+
+def _fetch_and_cache(city_names: list, max_length: int, force: bool = False) -> dict:
+    """
+    Fetch `city_names` upstream (re-checking the cache first) and cache results.
+    
+    Returns {city_name: summary}; cities that fail or have no extract get ''
+    and a negative cache entry. With `force`, cached entries are refetched.
+    While the circuit breaker is open nothing is sent upstream.
+    """
+    results = {}
+    misses = []
+    for city in city_names:
+        # another flight may have filled the cache since the caller checked
+        cached = None if force else _cache_get(city, record=False)
+        if cached is not None:
+            results[city] = cached
+        else:
+            misses.append(city)
+    
+    client = get_client()
+    for start in range(0, len(misses), BATCH_SIZE):
+        chunk = misses[start:start + BATCH_SIZE]
+        if not BREAKER.allow():
+            if metrics.ENABLED:
+                UPSTREAM_REQUESTS.labels('short_circuit').inc()
+            results.update((city, _cache_get(city, record=False) or '') for city in chunk)
+            continue
+        started = time.perf_counter()
+        try:
+            extracts = client.query_extracts(chunk)
+            BREAKER.record_success()
+            outcome = 'success'
+        except (URLError, json.JSONDecodeError, KeyError, IndexError, Exception) as e:
+            # silently fail for this chunk (network error, parsing, etc.)
+            BREAKER.record_failure()
+            extracts = {}
+            outcome = 'failure'
+        if metrics.ENABLED:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started)
+            UPSTREAM_REQUESTS.labels(outcome).inc()
+        fetched = {}
+        for city in chunk:
+            extract = extracts.get(city, '').strip()
+            if extract:
+                fetched[city] = _trim_summary(extract, max_length)
+            else:
+                # a failed refresh keeps serving the stale summary
+                results[city] = _cache_get(city, record=False) or ''
+                _cache_negative(city)
+        results.update(fetched)
+        if fetched:
+            _cache_put_many(fetched)
+    
+    return results
+
+
+def get_enriched_fact(city_name: str, base_fact: str = '', timeout: float = None) -> dict:
     """
     Return a dict with 'fact' (base fact) and 'wikipedia_summary' (fetched summary).
     
+    With `timeout`, falls back to the base fact ('source': 'local') when no
+    summary is available within that many seconds.
+    
     Returns: {'fact': str, 'wikipedia_summary': str, 'source': 'wikipedia'}
     """
-    summary = fetch_wikipedia_summary(city_name)
+    summary = fetch_wikipedia_summary(city_name, timeout=timeout)
+    return _enriched(base_fact, summary)
+
+
+def get_enriched_facts(base_facts: dict, timeout: float = None) -> dict:
+    """
+    Batch form of `get_enriched_fact`.
+    
+    Takes {city_name: base_fact} and returns {city_name: enriched dict},
+    fetching all uncached summaries in grouped upstream requests.
+    """
+    summaries = fetch_wikipedia_summaries(list(base_facts), timeout=timeout)
+    return {city: _enriched(fact, summaries.get(city, '')) for city, fact in base_facts.items()}
+
+
+def _enriched(base_fact: str, summary: str) -> dict:
     return {
         'fact': base_fact,
         'wikipedia_summary': summary,
@@ -107,6 +911,126 @@ def get_enriched_fact(city_name: str, base_fact: str = '') -> dict:
     }
 
 
+# per-event-loop single-flight and background refresh tasks for the async path
+_ASYNC_FLIGHTS = {}
+_ASYNC_TASKS = set()
+
+
+def _reset_after_fork():
+    """Drop per-process state in a forked child (see prefork.py).
+    
+    Pool threads, pooled sockets, in-flight calls and locks held by other
+    threads at fork time do not carry over to the child, so each worker
+    starts its own. The warm LRU is kept, and the store reopens its
+    connection by pid.
+    """
+    global _executor, _executor_lock, _client, _client_lock, _async_client, _FLIGHTS
+    _executor = None
+    _executor_lock = threading.Lock()
+    _client = None
+    _client_lock = threading.Lock()
+    _async_client = None
+    _FLIGHTS = SingleFlight()
+    _ASYNC_FLIGHTS.clear()
+    _ASYNC_TASKS.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def fetch_wikipedia_summary_async(city_name: str, max_length: int = 200, timeout: float = None) -> str:
+    """
+    Async form of `fetch_wikipedia_summary` for the ASGI server.
+    
+    Shares the LRU, negative cache, persistent store and circuit breaker
+    with the sync path; the upstream request runs on the event loop
+    instead of a worker thread. Persistent store reads and writes (which
+    can wait on SQLite locks) run in a thread so they never stall the loop.
+    """
+    entry = await _cache_entry_async(city_name)
+    if entry is not None:
+        summary, fetched_at = entry
+        now = time.time()
+        if (summary and now - fetched_at > CACHE_TTL and city_name not in _ASYNC_FLIGHTS
+                and NEGATIVE_CACHE.get(city_name, 0) <= now):
+            _async_flight(city_name, max_length, force=True)
+        return summary
+    
+    flight = asyncio.shield(_async_flight(city_name, max_length))
+    if timeout is None:
+        return await flight
+    try:
+        return await asyncio.wait_for(flight, timeout)
+    except asyncio.TimeoutError:
+        return ''
+
+
+async def _cache_entry_async(city_name: str, record: bool = True):
+    """`_cache_entry` that reads the persistent store off the event loop."""
+    if city_name in CACHE:
+        return _cache_entry(city_name, record)
+    return await asyncio.to_thread(_cache_entry, city_name, record)
+
+
+async def _cache_get_async(city_name: str, record: bool = True):
+    entry = await _cache_entry_async(city_name, record)
+    return entry[0] if entry is not None else None
+
+
+def _async_flight(city_name: str, max_length: int, force: bool = False) -> asyncio.Task:
+    """Return the in-flight fetch task for `city_name`, starting one if needed."""
+    task = _ASYNC_FLIGHTS.get(city_name)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_and_cache_async(city_name, max_length, force))
+        _ASYNC_FLIGHTS[city_name] = task
+        _ASYNC_TASKS.add(task)
+        
+        def done(t):
+            _ASYNC_FLIGHTS.pop(city_name, None)
+            _ASYNC_TASKS.discard(t)
+        task.add_done_callback(done)
+    return task
+
+
+async def _fetch_and_cache_async(city_name: str, max_length: int, force: bool = False) -> str:
+    """Async form of `_fetch_and_cache` for a single city."""
+    cached = None if force else await _cache_get_async(city_name, record=False)
+    if cached is not None:
+        return cached
+    if not BREAKER.allow():
+        if metrics.ENABLED:
+            UPSTREAM_REQUESTS.labels('short_circuit').inc()
+        return await _cache_get_async(city_name, record=False) or ''
+    started = time.perf_counter()
+    try:
+        extracts = await get_async_client().query_extracts([city_name])
+        BREAKER.record_success()
+        outcome = 'success'
+    except (URLError, json.JSONDecodeError, KeyError, IndexError, Exception) as e:
+        # silently fail (network error, parsing, etc.)
+        BREAKER.record_failure()
+        extracts = {}
+        outcome = 'failure'
+    if metrics.ENABLED:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started)
+        UPSTREAM_REQUESTS.labels(outcome).inc()
+    extract = extracts.get(city_name, '').strip()
+    if extract:
+        summary = _trim_summary(extract, max_length)
+        await asyncio.to_thread(_cache_put, city_name, summary)
+        return summary
+    # a failed refresh keeps serving the stale summary
+    summary = await _cache_get_async(city_name, record=False) or ''
+    _cache_negative(city_name)
+    return summary
+
+
+async def get_enriched_fact_async(city_name: str, base_fact: str = '', timeout: float = None) -> dict:
+    """Async form of `get_enriched_fact`."""
+    summary = await fetch_wikipedia_summary_async(city_name, timeout=timeout)
+    return _enriched(base_fact, summary)
+
+
 if __name__ == '__main__':
     # Test: fetch a few cities
     load_cache()
@@ -1,7 +1,8 @@
 """
 capital_lookup.py
 
-Provides lookup functions for US states, Indian states/UTs, and UK constituent countries.
+Provides lookup functions for the subdivisions (states, regions, constituent
+countries) of every country in the dataset under data/ (see dataset.py).
 Includes enrichment with Wikipedia summaries via capital_enricher.py.
 
 Usage examples:
@@ -11,137 +12,22 @@ Usage examples:
 """
 import random
 import textwrap
+from bisect import bisect_left
+from heapq import nsmallest
+from itertools import islice
+
+import metrics
+from dataset import open_dataset, CountryMap, FactMap
 
 try:
-    from capital_enricher import get_enriched_fact
+    from capital_enricher import get_enriched_fact, get_enriched_facts, get_enriched_fact_async, cache_version
     HAS_ENRICHER = True
 except ImportError:
     HAS_ENRICHER = False
 
-DATA = {
-    'us': {
-        'Alabama': 'Montgomery', 'Alaska': 'Juneau', 'Arizona': 'Phoenix', 'Arkansas': 'Little Rock', 'California': 'Sacramento',
-        'Colorado': 'Denver', 'Connecticut': 'Hartford', 'Delaware': 'Dover', 'Florida': 'Tallahassee', 'Georgia': 'Atlanta',
-        'Hawaii': 'Honolulu', 'Idaho': 'Boise', 'Illinois': 'Springfield', 'Indiana': 'Indianapolis', 'Iowa': 'Des Moines',
-        'Kansas': 'Topeka', 'Kentucky': 'Frankfort', 'Louisiana': 'Baton Rouge', 'Maine': 'Augusta', 'Maryland': 'Annapolis',
-        'Massachusetts': 'Boston', 'Michigan': 'Lansing', 'Minnesota': 'St. Paul', 'Mississippi': 'Jackson', 'Missouri': 'Jefferson City',
-        'Montana': 'Helena', 'Nebraska': 'Lincoln', 'Nevada': 'Carson City', 'New Hampshire': 'Concord', 'New Jersey': 'Trenton',
-        'New Mexico': 'Santa Fe', 'New York': 'Albany', 'North Carolina': 'Raleigh', 'North Dakota': 'Bismarck', 'Ohio': 'Columbus',
-        'Oklahoma': 'Oklahoma City', 'Oregon': 'Salem', 'Pennsylvania': 'Harrisburg', 'Rhode Island': 'Providence', 'South Carolina': 'Columbia',
-        'South Dakota': 'Pierre', 'Tennessee': 'Nashville', 'Texas': 'Austin', 'Utah': 'Salt Lake City', 'Vermont': 'Montpelier',
-        'Virginia': 'Richmond', 'Washington': 'Olympia', 'West Virginia': 'Charleston', 'Wisconsin': 'Madison', 'Wyoming': 'Cheyenne',
-        'District of Columbia': 'Washington, D.C.'
-    },
-    'india': {
-        'Andhra Pradesh': 'Amaravati', 'Arunachal Pradesh': 'Itanagar', 'Assam': 'Dispur', 'Bihar': 'Patna', 'Chhattisgarh': 'Raipur',
-        'Goa': 'Panaji', 'Gujarat': 'Gandhinagar', 'Haryana': 'Chandigarh', 'Himachal Pradesh': 'Shimla', 'Jharkhand': 'Ranchi',
-        'Karnataka': 'Bengaluru', 'Kerala': 'Thiruvananthapuram', 'Madhya Pradesh': 'Bhopal', 'Maharashtra': 'Mumbai', 'Manipur': 'Imphal',
-        'Meghalaya': 'Shillong', 'Mizoram': 'Aizawl', 'Nagaland': 'Kohima', 'Odisha': 'Bhubaneswar', 'Punjab': 'Chandigarh',
-        'Rajasthan': 'Jaipur', 'Sikkim': 'Gangtok', 'Tamil Nadu': 'Chennai', 'Telangana': 'Hyderabad', 'Tripura': 'Agartala',
-        'Uttar Pradesh': 'Lucknow', 'Uttarakhand': 'Dehradun', 'West Bengal': 'Kolkata',
-        'Andaman and Nicobar Islands': 'Port Blair', 'Chandigarh (UT)': 'Chandigarh',
-        'Dadra and Nagar Haveli and Daman and Diu': 'Daman', 'Delhi': 'New Delhi', 'Jammu and Kashmir': 'Srinagar',
-        'Ladakh': 'Leh', 'Puducherry': 'Puducherry', 'Lakshadweep': 'Kavaratti'
-    },
-    'uk': {
-        'England': 'London', 'Scotland': 'Edinburgh', 'Wales': 'Cardiff', 'Northern Ireland': 'Belfast'
-    }
-}
-
-FUN_FACTS = {
-    # US Capitals
-    'Montgomery': 'Montgomery is famous for the Civil Rights movement and has beautiful historic sites.',
-    'Juneau': 'Juneau is Alaska\'s capital and can only be reached by plane or boat!',
-    'Phoenix': 'Phoenix is one of the hottest US cities with desert landscapes and Native American culture.',
-    'Little Rock': 'Little Rock is known for its role in Civil Rights history and beautiful parks.',
-    'Sacramento': 'Sacramento started as a Gold Rush town and has a historic riverfront.',
-    'Denver': 'Denver is nicknamed the "Mile High City" because it sits exactly 1 mile above sea level!',
-    'Hartford': 'Hartford is home to the oldest continuously published newspaper in the US.',
-    'Dover': 'Dover is one of the oldest cities in the US with colonial-era buildings.',
-    'Tallahassee': 'Tallahassee is surrounded by beautiful forests and natural springs.',
-    'Atlanta': 'Atlanta is known for being a major hub and played a key role in Civil Rights history.',
-    'Honolulu': 'Honolulu is on the island of Oahu and is famous for beaches like Waikiki.',
-    'Boise': 'Boise sits in a valley surrounded by mountains and is a great outdoor adventure city.',
-    'Springfield': 'Springfield is the capital of Illinois and has lots of Abraham Lincoln sites to visit.',
-    'Indianapolis': 'Indianapolis is famous for the Indy 500 car race and has cool racing museums!',
-    'Des Moines': 'Des Moines is in the heart of farm country and has great science museums.',
-    'Topeka': 'Topeka is the capital of Kansas and has beautiful sunflower fields nearby.',
-    'Frankfort': 'Frankfort is known for bourbon distilleries and historic Main Street.',
-    'Baton Rouge': 'Baton Rouge sits on the mighty Mississippi River with Southern charm.',
-    'Augusta': 'Augusta is Maine\'s capital and is close to beautiful lakes and outdoor activities.',
-    'Annapolis': 'Annapolis is home to the US Naval Academy and has historic colonial streets.',
-    'Boston': 'Boston is famous for the Freedom Trail and being the birthplace of the American Revolution!',
-    'Lansing': 'Lansing is Michigan\'s capital and is surrounded by Great Lakes and natural beauty.',
-    'St. Paul': 'St. Paul sits across the Mississippi River from Minneapolis and has fantastic museums.',
-    'Jackson': 'Jackson is Mississippi\'s capital and has important Civil Rights museums.',
-    'Jefferson City': 'Jefferson City sits on the Missouri River and is named after Thomas Jefferson.',
-    'Helena': 'Helena is Montana\'s capital surrounded by beautiful mountains and outdoor adventures.',
-    'Lincoln': 'Lincoln is Nebraska\'s capital and is home to the Cornhuskers university.',
-    'Carson City': 'Carson City is Nevada\'s capital and was named after the famous frontiersman Kit Carson.',
-    'Concord': 'Concord is New Hampshire\'s capital and has a beautiful state house building.',
-    'Trenton': 'Trenton sits on the Delaware River and has important Revolutionary War history.',
-    'Santa Fe': 'Santa Fe has beautiful Pueblo-style architecture and amazing art galleries and museums!',
-    'Albany': 'Albany is one of the oldest surviving settlements of the original British thirteen colonies.',
-    'Raleigh': 'Raleigh is North Carolina\'s capital and has beautiful museums and gardens.',
-    'Bismarck': 'Bismarck is North Dakota\'s capital on the Missouri River with scenic views.',
-    'Columbus': 'Columbus is Ohio\'s largest city and has great science and natural history museums.',
-    'Oklahoma City': 'Oklahoma City has a fascinating history and beautiful memorials.',
-    'Salem': 'Salem is Oregon\'s capital and was founded as a fur trading post.',
-    'Harrisburg': 'Harrisburg sits on the Susquehanna River and has historic Pennsylvania history.',
-    'Providence': 'Providence is Rhode Island\'s capital and has beautiful colonial architecture.',
-    'Columbia': 'Columbia is South Carolina\'s capital and has beautiful historic districts.',
-    'Pierre': 'Pierre is South Dakota\'s capital and sits on the Missouri River.',
-    'Nashville': 'Nashville is famous as "Music City USA" and has the Grand Ole Opry!',
-    'Austin': "Austin is famous for live music and concerts — 'Keep Austin Weird' is its motto!",
-    'Salt Lake City': 'Salt Lake City is surrounded by mountains and hosted the 2002 Winter Olympics.',
-    'Montpelier': 'Montpelier is Vermont\'s capital and is surrounded by beautiful forests and mountains.',
-    'Richmond': 'Richmond is Virginia\'s capital and has important American history and museums.',
-    'Olympia': 'Olympia is Washington\'s capital and sits on Puget Sound with scenic views.',
-    'Charleston': 'Charleston is West Virginia\'s capital and sits on the Kanawha River.',
-    'Madison': 'Madison is Wisconsin\'s capital and sits between two beautiful lakes.',
-    'Cheyenne': 'Cheyenne is Wyoming\'s capital and has a great frontier heritage.',
-    'Washington, D.C.': 'Washington, D.C. is the capital of the USA and has amazing free museums and monuments!',
-    # India Capitals
-    'Amaravati': 'Amaravati is an ancient city with temples and is known for silk production.',
-    'Itanagar': 'Itanagar is surrounded by mountains and forests in northeast India.',
-    'Dispur': 'Dispur is Assam\'s capital and is known for tea gardens nearby.',
-    'Patna': 'Patna is an ancient city on the Ganges River with Buddhist heritage sites.',
-    'Raipur': 'Raipur is known for steel production and has beautiful temples.',
-    'Panaji': 'Panaji is a beautiful coastal city with Portuguese colonial architecture.',
-    'Gandhinagar': 'Gandhinagar is a planned city named after Mahatma Gandhi.',
-    'Chandigarh': 'Chandigarh is a beautiful planned city with great architecture and gardens.',
-    'Shimla': 'Shimla is a hill station with cool weather and beautiful mountain views!',
-    'Ranchi': 'Ranchi is surrounded by waterfalls and beautiful natural scenery.',
-    'Bengaluru': 'Bengaluru is India\'s tech hub — the "Silicon Valley of India" with IT companies!',
-    'Thiruvananthapuram': 'Thiruvananthapuram has beautiful beaches and is known for spices.',
-    'Bhopal': 'Bhopal is known for beautiful lakes and historic palaces.',
-    'Mumbai': "Mumbai is India's largest city and is famous for Bollywood movies!",
-    'Imphal': 'Imphal is in a beautiful valley surrounded by mountains.',
-    'Shillong': 'Shillong is a hill station known as the "Scotland of the East" with cool weather.',
-    'Aizawl': 'Aizawl is a beautiful hill city with scenic mountain views.',
-    'Kohima': 'Kohima is a hill station surrounded by beautiful landscapes.',
-    'Bhubaneswar': 'Bhubaneswar is known for ancient temples and beautiful beaches nearby.',
-    'Jaipur': 'Jaipur is the famous "Pink City" with beautiful palaces and amazing forts nearby!',
-    'Gangtok': 'Gangtok is a hill station with mountain views and Buddhist monasteries.',
-    'Chennai': 'Chennai has beautiful temples and a long coastline on the Bay of Bengal.',
-    'Hyderabad': 'Hyderabad is known for pearls, biryani food, and IT industry.',
-    'Agartala': 'Agartala is known for beautiful palaces and temples.',
-    'Lucknow': 'Lucknow is known for beautiful Mughal architecture and amazing biryani food!',
-    'Dehradun': 'Dehradun is a hill city with yoga centers and nature all around.',
-    'Kolkata': 'Kolkata is known for literature, art, and is the "City of Joy"!',
-    'Port Blair': 'Port Blair is on the Andaman Islands with beautiful beaches.',
-    'Daman': 'Daman has beautiful beaches and Portuguese colonial architecture.',
-    'New Delhi': 'New Delhi is India\'s capital with India Gate, palaces, and amazing monuments!',
-    'Srinagar': 'Srinagar is in Kashmir and is famous for beautiful houseboats and gardens.',
-    'Leh': 'Leh is high in the mountains of Ladakh with amazing trekking and Buddhist sites.',
-    'Puducherry': 'Puducherry has beautiful beaches and French colonial architecture.',
-    'Kavaratti': 'Kavaratti is in the Lakshadweep Islands with beautiful tropical beaches.',
-    # UK Capitals
-    'London': 'London has the famous River Thames and is full of history back to Roman times!',
-    'Edinburgh': 'Edinburgh has a castle on a volcanic rock — great for imagining knights and history!',
-    'Cardiff': 'Cardiff is Wales\' capital and has beautiful castles and museums.',
-    'Belfast': 'Belfast is Northern Ireland\'s capital with historic architecture and museums.'
-}
+# regions and fun facts live in data/ (see dataset.py); each country is read on first use
+DATA = CountryMap(open_dataset())
+FUN_FACTS = FactMap(DATA)
 
 
 def normalize(s: str) -> str:
@@ -149,6 +35,207 @@ def normalize(s: str) -> str:
     return s.strip().lower()
 
 
+LOOKUP_TIER = metrics.Counter(
+    'capital_lookup_matches_total', 'find_capital results by matching tier (exact, prefix, includes, miss).', ['tier'])
+
+
+class _CountryIndex:
+    """Precomputed lookup structures for one country's state names.
+
+    Built once per country on first use so each query does hash/bisect work
+    instead of re-normalizing every key:
+      - `states`, `capitals`: parallel tuples in DATA order (O(1) random picks)
+      - `exact`: normalized name -> first state (in DATA order) with that name
+      - `prefixes`: sorted (normalized name, position) pairs for prefix hits
+      - `suffixes`: sorted (suffix, position) pairs, a small suffix array
+        answering the "includes" tier as a prefix search over suffixes
+      - `prefix_min`, `suffix_min`: range-minimum tables over the positions
+        in `prefixes` and `suffixes`, so the earliest match in a bisected
+        range is found in O(1) however many names match
+      - `grams`: trigram -> positions, an inverted index that narrows fuzzy
+        (typo-tolerant) matching to a few candidates before edit distance
+    Ties inside a tier resolve to the lowest DATA position, which keeps the
+    results identical to the original exact -> startswith -> includes scans.
+    """
+
+    def __init__(self, map_: dict):
+        self.states = tuple(map_.keys())
+        self.capitals = tuple(map_.values())
+        self.exact = {}
+        self.prefixes = []
+        self.suffixes = []
+        self.keys = []
+        self.grams = {}
+        for pos, state in enumerate(self.states):
+            key = normalize(state)
+            self.keys.append(key)
+            self.exact.setdefault(key, pos)
+            self.prefixes.append((key, pos))
+            for i in range(len(key)):
+                self.suffixes.append((key[i:], pos))
+            for gram in _trigrams(key):
+                self.grams.setdefault(gram, []).append(pos)
+        self.prefixes.sort()
+        self.suffixes.sort()
+        self.prefix_min = _RangeMin([pos for _, pos in self.prefixes])
+        self.suffix_min = _RangeMin([pos for _, pos in self.suffixes])
+
+    @staticmethod
+    def _first_with_prefix(pairs: list, mins, q: str):
+        """Lowest position among `pairs` whose text starts with `q` (`mins` is their _RangeMin)."""
+        lo = bisect_left(pairs, (q,))
+        end = _prefix_successor(q)
+        hi = bisect_left(pairs, (end,), lo) if end is not None else len(pairs)
+        return mins.query(lo, hi)
+
+    def similar(self, q: str, limit: int, min_score: float) -> list:
+        """Return up to `limit` (score, position) pairs for names close to `q`.
+        
+        Names sharing the most trigrams with `q` are shortlisted from the
+        inverted index, then scored as 1 - edit_distance / longer length.
+        """
+        shared = {}
+        for gram in _trigrams(q):
+            for pos in self.grams.get(gram, ()):
+                shared[pos] = shared.get(pos, 0) + 1
+        shortlist = nsmallest(FUZZY_CANDIDATES, shared, key=lambda pos: (-shared[pos], pos))
+        scored = []
+        for pos in shortlist:
+            key = self.keys[pos]
+            longest = max(len(q), len(key))
+            # the length gap alone is a lower bound on the edit distance
+            if 1 - abs(len(q) - len(key)) / longest < min_score:
+                continue
+            score = 1 - _edit_distance(q, key) / longest
+            if score >= min_score:
+                scored.append((round(score, 3), pos))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
+
+    def top_k(self, q: str, limit: int) -> list:
+        """Return up to `limit` positions of names containing `q`, best first.
+        
+        Names starting with `q` come first (alphabetical, straight off the
+        sorted prefix array), then names containing it elsewhere, also
+        alphabetical. The includes tier is only searched when prefix hits
+        do not fill `limit`.
+        """
+        results = []
+        lo = bisect_left(self.prefixes, (q,))
+        for text, pos in islice(self.prefixes, lo, None):
+            if len(results) >= limit or not text.startswith(q):
+                break
+            results.append(pos)
+        if len(results) < limit and q:
+            seen = set(results)
+            lo = bisect_left(self.suffixes, (q,))
+            for text, pos in islice(self.suffixes, lo, None):
+                if not text.startswith(q):
+                    break
+                seen.add(pos)
+            inner = seen.difference(results)
+            results.extend(nsmallest(limit - len(results), inner, key=lambda pos: (self.keys[pos], pos)))
+        return results
+
+    def find(self, q: str):
+        """Return the DATA position matching normalized query `q`, or None."""
+        tier = 'exact'
+        pos = self.exact.get(q)
+        if pos is None:
+            tier = 'prefix'
+            pos = self._first_with_prefix(self.prefixes, self.prefix_min, q)
+        if pos is None and q:
+            tier = 'includes'
+            pos = self._first_with_prefix(self.suffixes, self.suffix_min, q)
+        if metrics.ENABLED:
+            LOOKUP_TIER.labels(tier if pos is not None else 'miss').inc()
+        return pos
+
+
+def _prefix_successor(q: str):
+    """Smallest string after every string starting with `q`, or None if there is none."""
+    # every text starting with q sorts before q with its last character bumped
+    q = q.rstrip(chr(0x10ffff))
+    return q[:-1] + chr(ord(q[-1]) + 1) if q else None
+
+
+class _RangeMin:
+    """Sparse table answering min(values[lo:hi]) in O(1) after O(n log n) setup."""
+
+    def __init__(self, values: list):
+        # levels[k][i] is the minimum of values[i:i + 2**k]
+        self.levels = [values]
+        span = 1
+        while span * 2 <= len(values):
+            prev = self.levels[-1]
+            self.levels.append([min(prev[i], prev[i + span]) for i in range(len(prev) - span)])
+            span *= 2
+
+    def query(self, lo: int, hi: int):
+        """Minimum of values[lo:hi], or None for an empty range."""
+        if lo >= hi:
+            return None
+        k = (hi - lo).bit_length() - 1
+        row = self.levels[k]
+        return min(row[lo], row[hi - (1 << k)])
+
+
+def _trigrams(key: str) -> set:
+    """Character trigrams of `key`, padded so short names and word edges count."""
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between `a` and `b` (two-row dynamic programming)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+FUZZY_CANDIDATES = 10  # shortlist size taken from the trigram index before scoring
+
+_INDEXES = {}
+
+
+def _get_index(country_key: str):
+    """Return the (lazily built) `_CountryIndex` for `country_key`, or None."""
+    index = _INDEXES.get(country_key)
+    if index is None:
+        map_ = DATA.get(country_key)
+        if not map_:
+            return None
+        index = _INDEXES[country_key] = _CountryIndex(map_)
+    return index
+
+
+def warm_indexes() -> int:
+    """Load every country and build its index now instead of on first use.
+    
+    Run before forking workers so they share the structures copy-on-write.
+    Returns the number of regions indexed; countries without regions have
+    no index and are skipped.
+    """
+    total = 0
+    for country_key in DATA:
+        index = _get_index(country_key)
+        if index is not None:
+            total += len(index.states)
+    return total
+
+
+def reload_dataset():
+    """Re-read the dataset from disk and drop the indexes built from the old one."""
+    DATA.reload()
+    _INDEXES.clear()
+
+
 def find_capital(query: str, country_key: str):
     """Find capital for a given state/region `query` in country `country_key`.
 
@@ -158,58 +245,161 @@ def find_capital(query: str, country_key: str):
     if not query:
         return None
     country_key = country_key.lower()
-    map_ = DATA.get(country_key)
-    if not map_:
+    index = _get_index(country_key)
+    if index is None:
         return None
-    q = normalize(query)
-    # exact
-    for k in map_.keys():
-        if normalize(k) == q:
-            return {'state': k, 'capital': map_[k]}
-    # startswith
-    for k in map_.keys():
-        if normalize(k).startswith(q):
-            return {'state': k, 'capital': map_[k]}
-    # includes
-    for k in map_.keys():
-        if q in normalize(k):
-            return {'state': k, 'capital': map_[k]}
-    return None
+    pos = index.find(normalize(query))
+    if pos is None:
+        return None
+    return {'state': index.states[pos], 'capital': index.capitals[pos]}
+
+
+def did_you_mean(query: str, country_key: str, limit: int = 3, min_score: float = 0.6) -> list:
+    """Suggest states whose names are close to a misspelled `query`.
+    
+    Returns up to `limit` dicts with keys `state`, `capital` and `score`
+    (0-1, higher is closer), best match first. Handy when `find_capital`
+    returns None for typos like "Califronia" or "Karnatka".
+    """
+    if not query:
+        return []
+    country_key = country_key.lower()
+    index = _get_index(country_key)
+    if index is None:
+        return []
+    return [
+        {'state': index.states[pos], 'capital': index.capitals[pos], 'score': score}
+        for score, pos in index.similar(normalize(query), limit, min_score)
+    ]
+
+
+def suggest(query: str, country_key: str, limit: int = 10) -> list:
+    """Return up to `limit` typeahead matches for `query` in ranked order.
+    
+    States whose name starts with the query come first, then states that
+    contain it elsewhere; each group is alphabetical. Returns a list of
+    dicts with keys `state` and `capital`.
+    """
+    country_key = country_key.lower()
+    index = _get_index(country_key)
+    if index is None or limit <= 0:
+        return []
+    return [
+        {'state': index.states[pos], 'capital': index.capitals[pos]}
+        for pos in index.top_k(normalize(query or ''), limit)
+    ]
+
+
+def countries() -> list:
+    """Return [{'key', 'name', 'regions'}] for every country in the dataset, without loading any."""
+    return [{'key': key, 'name': info['name'], 'regions': info['regions']} for key, info in DATA.info.items()]
 
 
 def random_pick(country_key: str):
     """Return a random (state, capital) tuple for the given country key."""
-    country_key = country_key.lower()
-    map_ = DATA.get(country_key)
-    if not map_:
+    index = _get_index(country_key.lower())
+    if index is None:
         return None
-    state = random.choice(list(map_.keys()))
-    return {'state': state, 'capital': map_[state]}
+    pos = random.randrange(len(index.states))
+    return {'state': index.states[pos], 'capital': index.capitals[pos]}
+
 
+def region_count(country_key: str) -> int:
+    """Return the number of states/regions in `country_key` (0 if unknown)."""
+    index = _get_index(country_key.lower())
+    return len(index.states) if index is not None else 0
 
-def get_fact_with_enrichment(capital_name: str) -> dict:
+
+def region_at(country_key: str, pos: int) -> dict:
+    """Return the state/region at position `pos` (dataset order) as a dict with keys `state` and `capital`."""
+    index = _get_index(country_key.lower())
+    return {'state': index.states[pos], 'capital': index.capitals[pos]}
+
+
+def local_fact(capital_name: str) -> str:
+    """Return the dataset's fun fact for a capital, or a generic one."""
+    return FUN_FACTS.get(capital_name, f'{capital_name} is an interesting place to visit!')
+
+
+def is_known_capital(capital_name: str) -> bool:
+    """True if some country in the dataset has `capital_name` as a capital."""
+    return bool(DATA.store.fact_countries(capital_name))
+
+
+def get_fact_with_enrichment(capital_name: str, timeout: float = None) -> dict:
     """Return fact + Wikipedia summary for a capital.
     
     Returns a dict with keys: 'fact', 'wikipedia_summary', 'source'.
-    If enricher unavailable, returns only the local fact.
+    If enricher unavailable (or no summary arrives within `timeout`
+    seconds), returns only the local fact.
     """
-    base_fact = FUN_FACTS.get(capital_name, f'{capital_name} is an interesting place to visit!')
+    base_fact = local_fact(capital_name)
     if HAS_ENRICHER:
         try:
-            return get_enriched_fact(capital_name, base_fact)
+            return get_enriched_fact(capital_name, base_fact, timeout=timeout)
         except Exception:
             # fallback if enricher fails
             return {'fact': base_fact, 'wikipedia_summary': '', 'source': 'local'}
     return {'fact': base_fact, 'wikipedia_summary': '', 'source': 'local'}
 
 
+async def get_fact_with_enrichment_async(capital_name: str, timeout: float = None) -> dict:
+    """Async form of `get_fact_with_enrichment` (non-blocking Wikipedia fetch)."""
+    base_fact = local_fact(capital_name)
+    if HAS_ENRICHER:
+        try:
+            return await get_enriched_fact_async(capital_name, base_fact, timeout=timeout)
+        except Exception:
+            return {'fact': base_fact, 'wikipedia_summary': '', 'source': 'local'}
+    return {'fact': base_fact, 'wikipedia_summary': '', 'source': 'local'}
+
+
+def enrichment_version(capital_name: str):
+    """Return a token that changes when the enrichment cached for `capital_name` changes."""
+    if HAS_ENRICHER:
+        return cache_version(capital_name)
+    return None
+
+
+def lookup_result(capital_result: dict, enriched: dict) -> dict:
+    """Combine a `find_capital` result with its enrichment (the /api/lookup shape)."""
+    return {
+        'state': capital_result['state'],
+        'capital': capital_result['capital'],
+        'fact': enriched.get('fact', ''),
+        'wikipedia_summary': enriched.get('wikipedia_summary', ''),
+        'source': enriched.get('source', 'local')
+    }
+
+
+def get_facts_with_enrichment(capital_names, timeout: float = None) -> dict:
+    """Batch form of `get_fact_with_enrichment`.
+    
+    Returns {capital_name: enriched dict} for every distinct name, resolving
+    all Wikipedia cache misses in grouped upstream requests.
+    """
+    base_facts = {
+        name: local_fact(name)
+        for name in capital_names
+    }
+    if HAS_ENRICHER:
+        try:
+            return get_enriched_facts(base_facts, timeout=timeout)
+        except Exception:
+            pass
+    return {
+        name: {'fact': fact, 'wikipedia_summary': '', 'source': 'local'}
+        for name, fact in base_facts.items()
+    }
+
+
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser(
-        description='Lookup capital for a state/region (US, India, UK).'
+        description='Lookup capital for a state/region.'
     )
-    parser.add_argument('--country', '-c', default='us', choices=['us', 'india', 'uk'], help='Country key (us|india|uk)')
+    parser.add_argument('--country', '-c', default='us', choices=list(DATA), help=f"Country key ({'|'.join(DATA)})")
     parser.add_argument('--state', '-s', help='State/region name to lookup')
     parser.add_argument('--random', '-r', action='store_true', help='Pick a random state in the country')
 
@@ -4,16 +4,36 @@ Simple CLI wrapper around `capital_lookup.py` for interactive use.
 Run `python cli.py` to start a small REPL where you can pick country,
 enter state names, get capitals, and ask for a random suggestion.
 Includes Wikipedia enrichment if capital_enricher.py is available.
+
+Bulk mode streams many lookups through one process:
+  python cli.py bulk queries.jsonl --output results.jsonl
+  printf 'California\nKarnataka\n' | python cli.py bulk --country us --workers 16
+
+Each input line is either a JSON object {"country": "us", "state": "..."}
+or a bare state name (looked up in --country). Each output line is the
+/api/lookup result plus `query` and `country`, or an `error` (with
+`did_you_mean` suggestions for unknown states), in input order.
+Enrichment runs on a bounded thread pool, and at most --window lookups
+are held in memory at once, so memory stays flat for any input size.
+Throughput is reported on stderr at the end.
 """
-from capital_lookup import find_capital, random_pick, get_fact_with_enrichment
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from capital_lookup import (
+    find_capital, random_pick, get_fact_with_enrichment, did_you_mean, countries, lookup_result, local_fact,
+)
 import textwrap
 
 
 def main():
-    print('Capital Quest (CLI) — US, India, UK')
+    country_display = {c['key']: c['name'] for c in countries()}
+    print(f'Capital Quest (CLI) — {len(country_display)} countries')
     print('Type commands or "help" for instructions.')
-    country = 'us'
-    country_display = {'us': 'United States', 'india': 'India', 'uk': 'United Kingdom'}
+    country = 'us' if 'us' in country_display else next(iter(country_display))
 
     while True:
         prompt_name = country_display.get(country, country)
@@ -25,7 +45,8 @@ def main():
             break
         if cmd.lower() in ('help', '?'):
             print('Commands:')
-            print('  country [US|India|UK]   - switch country')
+            print('  country <key>           - switch country (see "countries")')
+            print('  countries               - list available countries')
             print('  find <state name>       - lookup capital for state')
             print('  random                  - pick a random state and show capital')
             print('  quit/exit               - exit')
@@ -36,18 +57,27 @@ def main():
 
         if verb == 'country' and arg:
             arg_lower = arg.lower()
-            if arg_lower in ('us', 'india', 'uk'):
+            if arg_lower in country_display:
                 country = arg_lower
-                country_display = {'us': 'United States', 'india': 'India', 'uk': 'United Kingdom'}
                 print(f"Switched to {country_display.get(country, country)}")
             else:
-                print('Unknown country. Use us, india, or uk.')
+                print(f"Unknown country. Use {', '.join(country_display)}.")
+            continue
+
+        if verb == 'countries':
+            for key, name in country_display.items():
+                print(f'  {key:<10} {name}')
             continue
 
         if verb == 'find' and arg:
             res = find_capital(arg, country)
             if not res:
-                print('No match found. Try a fuller name or use "random".')
+                suggestions = did_you_mean(arg, country)
+                if suggestions:
+                    names = ', '.join(s['state'] for s in suggestions)
+                    print(f'No match found. Did you mean: {names}?')
+                else:
+                    print('No match found. Try a fuller name or use "random".')
             else:
                 print(f"State/Region: {res['state']}")
                 print(f"Capital: {res['capital']}")
@@ -73,5 +103,102 @@ def main():
         print('Unknown command. Type "help" for instructions.')
 
 
+def _parse_query(line: str, default_country: str):
+    """Return (country, state) for one bulk input line."""
+    if line.startswith('{'):
+        item = json.loads(line)
+        if not isinstance(item, dict):
+            raise ValueError('Expected an object with country and state')
+        return str(item.get('country') or default_country).lower(), str(item.get('state') or '')
+    return default_country, line
+
+
+def bulk_lookup(line: str, default_country: str, enrich: bool = True) -> dict:
+    """Resolve one bulk input line to its output record."""
+    try:
+        country, state = _parse_query(line, default_country)
+    except ValueError:
+        return {'query': line, 'error': 'Invalid input line'}
+    record = {'query': state, 'country': country}
+    if not state:
+        record['error'] = 'Missing state'
+        return record
+    res = find_capital(state, country)
+    if not res:
+        record.update(error='Capital not found', did_you_mean=did_you_mean(state, country))
+        return record
+    if enrich:
+        enriched = get_fact_with_enrichment(res['capital'])
+    else:
+        enriched = {'fact': local_fact(res['capital']), 'wikipedia_summary': '', 'source': 'local'}
+    record.update(lookup_result(res, enriched))
+    return record
+
+
+def run_bulk(lines, out, default_country: str = 'us', workers: int = 8, window: int = 256,
+             enrich: bool = True) -> dict:
+    """Look up every line of `lines`, writing JSONL records to `out` in input order.
+    
+    At most `window` lookups are queued or running at once; the oldest is
+    written as soon as it finishes. Returns counts and elapsed time.
+    """
+    stats = {'total': 0, 'found': 0, 'errors': 0}
+    started = time.perf_counter()
+    pending = deque()
+    
+    def write(record):
+        stats['total'] += 1
+        stats['errors' if 'error' in record else 'found'] += 1
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk') as pool:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if len(pending) >= window:
+                if not pending[0].done():
+                    out.flush()  # hand finished lines downstream before blocking
+                write(pending.popleft().result())
+            pending.append(pool.submit(bulk_lookup, line, default_country, enrich))
+        while pending:
+            if not pending[0].done():
+                out.flush()
+            write(pending.popleft().result())
+    out.flush()
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def bulk_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='cli.py bulk', description='Look up many states from JSONL or plain text.')
+    parser.add_argument('input', nargs='?', help='Input file (default: stdin)')
+    parser.add_argument('--output', '-o', help='Output JSONL file (default: stdout)')
+    parser.add_argument('--country', '-c', default='us', help='Country for lines without one')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='Enrichment threads')
+    parser.add_argument('--window', type=int, default=256, help='Maximum lookups held in memory')
+    parser.add_argument('--no-enrich', action='store_true', help='Skip Wikipedia enrichment')
+    args = parser.parse_args(argv)
+
+    infile = open(args.input, 'r', encoding='utf-8') if args.input else sys.stdin
+    outfile = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        stats = run_bulk(infile, outfile, args.country.lower(), max(1, args.workers), max(1, args.window),
+                         enrich=not args.no_enrich)
+    finally:
+        if args.input:
+            infile.close()
+        if args.output:
+            outfile.close()
+    rate = stats['total'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"Processed {stats['total']} lines in {stats['seconds']:.2f}s ({rate:.1f} lines/s): "
+          f"{stats['found']} found, {stats['errors']} errors", file=sys.stderr)
+
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bulk':
+        bulk_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,287 @@
+"""
+dataset.py
+
+On-disk store for the capital dataset (regions, capitals and fun facts),
+loaded lazily one country at a time.
+
+Layout of the default directory store (`data/`):
+  data/manifest.json          {"countries": {"us": {"name": "United States", "file": "countries/us.json", "regions": 51}}}
+  data/capitals.json          {"Sacramento": ["us"], ...}   which countries list each capital
+  data/countries/us.json      {"name": "United States", "regions": {state: capital}, "facts": {capital: fact}}
+
+Only the manifest is read at start-up. A country file is parsed the first
+time that country is used, and `capitals.json` is read the first time a fun
+fact is looked up, so neither the API nor the CLI pays for countries nobody
+asks about.
+
+For large datasets the directory can be packed into a single indexed SQLite
+file; each country (or fact) is then one indexed query instead of a JSON parse:
+  python dataset.py pack data data/capitals.sqlite3
+  CAPITAL_DATASET=data/capitals.sqlite3 python api_server.py
+
+To add a country, drop `countries/<key>.json` into the directory and run
+  python dataset.py index data
+which rebuilds `manifest.json` and `capitals.json` from the country files.
+
+Usage:
+  from dataset import open_dataset, CountryMap, FactMap
+  store = open_dataset('data')
+  DATA = CountryMap(store)
+  print(DATA['uk'])
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+DATASET_PATH = os.environ.get(
+    'CAPITAL_DATASET', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+
+def _read_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, obj):
+    # one entry per line: small on disk, readable diffs
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=0)
+        f.write('\n')
+
+
+class DirectoryDataset:
+    """A manifest plus one JSON file per country."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._manifest = _read_json(os.path.join(path, 'manifest.json'))['countries']
+        self._capitals = None
+
+    def countries(self) -> dict:
+        """Return {country key: {'name': ..., 'regions': count}} in dataset order."""
+        return {key: {'name': meta['name'], 'regions': meta['regions']} for key, meta in self._manifest.items()}
+
+    def load_country(self, country_key: str):
+        """Return ({state: capital}, {capital: fact}) for one country, or None."""
+        meta = self._manifest.get(country_key)
+        if meta is None:
+            return None
+        record = _read_json(os.path.join(self.path, meta['file']))
+        return record['regions'], record.get('facts', {})
+
+    def fact_countries(self, capital: str) -> list:
+        """Return the keys of countries whose file may hold a fact for `capital`."""
+        if self._capitals is None:
+            self._capitals = _read_json(os.path.join(self.path, 'capitals.json'))
+        return self._capitals.get(capital, [])
+
+    def close(self):
+        pass
+
+
+class SQLiteDataset:
+    """The same data packed into one SQLite file (see `pack`)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # connections must not be shared across fork(); reopen in a child
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def countries(self) -> dict:
+        """Return {country key: {'name': ..., 'regions': count}} in dataset order."""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT key, name, regions FROM countries ORDER BY position').fetchall()
+        return {key: {'name': name, 'regions': regions} for key, name, regions in rows}
+
+    def load_country(self, country_key: str):
+        """Return ({state: capital}, {capital: fact}) for one country, or None."""
+        with self._lock:
+            conn = self._connection()
+            if conn.execute('SELECT 1 FROM countries WHERE key = ?', (country_key,)).fetchone() is None:
+                return None
+            regions = conn.execute(
+                'SELECT state, capital FROM regions WHERE country = ? ORDER BY position', (country_key,)).fetchall()
+            facts = conn.execute('SELECT capital, fact FROM facts WHERE country = ?', (country_key,)).fetchall()
+        return dict(regions), dict(facts)
+
+    def fact_countries(self, capital: str) -> list:
+        """Return the keys of countries that hold a fact for `capital`."""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT f.country FROM facts f JOIN countries c ON c.key = f.country '
+                'WHERE f.capital = ? ORDER BY c.position', (capital,)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def open_dataset(path: str = DATASET_PATH):
+    """Open a dataset directory, or a SQLite file built by `pack`."""
+    if os.path.isdir(path):
+        return DirectoryDataset(path)
+    return SQLiteDataset(path)
+
+
+class CountryMap(Mapping):
+    """Read-only {country key: {state: capital}} that loads each country on first access.
+
+    Keys, `len()` and `in` come from the manifest alone; iterating `.values()`
+    or `.items()` loads every country.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.info = store.countries()
+        self._regions = {}
+        self._facts = {}
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """Re-open the store and forget loaded countries (picks up `dataset.py index` changes)."""
+        store = open_dataset(self.store.path)
+        with self._lock:
+            self.store.close()
+            self.store = store
+            self.info = store.countries()
+            self._regions = {}
+            self._facts = {}
+
+    def _load(self, country_key: str):
+        regions = self._regions.get(country_key)
+        if regions is None:
+            if country_key not in self.info:
+                raise KeyError(country_key)
+            with self._lock:
+                regions = self._regions.get(country_key)
+                if regions is None:
+                    regions, facts = self.store.load_country(country_key)
+                    self._facts[country_key] = facts
+                    self._regions[country_key] = regions
+        return regions
+
+    def facts(self, country_key: str) -> dict:
+        """Return {capital: fact} for one country (loading it if needed)."""
+        self._load(country_key)
+        return self._facts[country_key]
+
+    def loaded(self) -> list:
+        """Return the keys of the countries loaded so far."""
+        return list(self._regions)
+
+    def __getitem__(self, country_key: str) -> dict:
+        return self._load(country_key)
+
+    def __contains__(self, country_key) -> bool:
+        return country_key in self.info
+
+    def __iter__(self):
+        return iter(self.info)
+
+    def __len__(self) -> int:
+        return len(self.info)
+
+
+class FactMap(Mapping):
+    """Read-only {capital: fun fact}, reading only the countries that list the capital."""
+
+    def __init__(self, countries: CountryMap):
+        self.countries = countries
+
+    def __getitem__(self, capital: str) -> str:
+        for country_key in self.countries.store.fact_countries(capital):
+            fact = self.countries.facts(country_key).get(capital)
+            if fact is not None:
+                return fact
+        raise KeyError(capital)
+
+    def __iter__(self):
+        seen = set()
+        for country_key in self.countries:
+            for capital in self.countries.facts(country_key):
+                if capital not in seen:
+                    seen.add(capital)
+                    yield capital
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def build_index(path: str):
+    """Rebuild `manifest.json` and `capitals.json` from the files in `countries/`."""
+    manifest_path = os.path.join(path, 'manifest.json')
+    previous = _read_json(manifest_path)['countries'] if os.path.exists(manifest_path) else {}
+    files = sorted(f for f in os.listdir(os.path.join(path, 'countries')) if f.endswith('.json'))
+    keys = [os.path.splitext(f)[0] for f in files]
+    # keep the existing order and append new countries alphabetically
+    ordered = [k for k in previous if k in keys] + [k for k in keys if k not in previous]
+
+    manifest = {}
+    capitals = {}
+    for key in ordered:
+        record = _read_json(os.path.join(path, 'countries', f'{key}.json'))
+        manifest[key] = {'name': record['name'], 'file': f'countries/{key}.json', 'regions': len(record['regions'])}
+        for capital in dict.fromkeys(record['regions'].values()):
+            capitals.setdefault(capital, []).append(key)
+    _write_json(manifest_path, {'countries': manifest})
+    _write_json(os.path.join(path, 'capitals.json'), capitals)
+    return manifest
+
+
+def pack(source: str, output: str):
+    """Write the directory dataset at `source` into the SQLite file `output`."""
+    store = DirectoryDataset(source)
+    if os.path.exists(output):
+        os.remove(output)
+    conn = sqlite3.connect(output)
+    with conn:
+        conn.execute('CREATE TABLE countries (key TEXT PRIMARY KEY, name TEXT NOT NULL, '
+                     'regions INTEGER NOT NULL, position INTEGER NOT NULL)')
+        conn.execute('CREATE TABLE regions (country TEXT NOT NULL, position INTEGER NOT NULL, '
+                     'state TEXT NOT NULL, capital TEXT NOT NULL, PRIMARY KEY (country, position)) WITHOUT ROWID')
+        conn.execute('CREATE TABLE facts (country TEXT NOT NULL, capital TEXT NOT NULL, '
+                     'fact TEXT NOT NULL, PRIMARY KEY (country, capital)) WITHOUT ROWID')
+        conn.execute('CREATE INDEX facts_capital ON facts (capital)')
+        for position, (key, meta) in enumerate(store.countries().items()):
+            regions, facts = store.load_country(key)
+            conn.execute('INSERT INTO countries VALUES (?, ?, ?, ?)', (key, meta['name'], meta['regions'], position))
+            conn.executemany('INSERT INTO regions VALUES (?, ?, ?, ?)',
+                             [(key, i, state, capital) for i, (state, capital) in enumerate(regions.items())])
+            conn.executemany('INSERT INTO facts VALUES (?, ?, ?)',
+                             [(key, capital, fact) for capital, fact in facts.items()])
+    conn.execute('VACUUM')
+    conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain the Capital Quest dataset.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    index_cmd = sub.add_parser('index', help='Rebuild manifest.json and capitals.json from countries/*.json')
+    index_cmd.add_argument('path', nargs='?', default=DATASET_PATH)
+    pack_cmd = sub.add_parser('pack', help='Pack a dataset directory into one SQLite file')
+    pack_cmd.add_argument('source', nargs='?', default=DATASET_PATH)
+    pack_cmd.add_argument('output', nargs='?', default=os.path.join(DATASET_PATH, 'capitals.sqlite3'))
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        manifest = build_index(args.path)
+        print(f'Indexed {len(manifest)} countries, {sum(m["regions"] for m in manifest.values())} regions.')
+    else:
+        pack(args.source, args.output)
+        print(f'Packed {args.source} into {args.output}')
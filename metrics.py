@@ -0,0 +1,165 @@
+"""
+metrics.py
+
+Minimal, dependency-free Prometheus-style metrics for Capital Quest.
+
+Counters and histograms are registered at import time by the modules they
+instrument and rendered in the Prometheus text exposition format by
+`render()` (served at /metrics by api_server.py).
+
+Instrumentation is on by default. Set CAPITAL_METRICS=0 to turn it off:
+call sites check `metrics.ENABLED` before touching a metric, so a disabled
+build pays one attribute lookup per site and nothing else.
+
+Usage:
+  import metrics
+  REQUESTS = metrics.Counter('app_requests_total', 'Requests served.', ['endpoint'])
+  if metrics.ENABLED:
+      REQUESTS.labels('/api/capital').inc()
+  print(metrics.render())
+"""
+import os
+import threading
+from bisect import bisect_left
+
+ENABLED = os.environ.get('CAPITAL_METRICS', '1') != '0'
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """Return the child metric for these label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {child.value:g}']
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            if i < len(self.counts):
+                self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Observations (e.g. latencies in seconds) counted into cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Record a value in the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            le = _format_labels(self.labelnames, values, f'le="{bound:g}"')
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+        inf = _format_labels(self.labelnames, values, 'le="+Inf"')
+        lines.append(f'{self.name}_bucket{inf} {child.count}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {child.sum:g}')
+        lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read from a callback at render time (no hot-path cost)."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, fn):
+        self.fn = fn
+        super().__init__(name, help)
+
+    def render(self) -> list:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {self.fn():g}']
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,222 @@
+"""
+offline_extracts.py
+
+Offline enrichment source: builds a compact title -> extract index from a
+local Wikipedia extracts dump, and serves it to capital_enricher.py in place
+of the live MediaWiki API.
+
+Ingestion streams the dump (bz2, gzip or uncompressed; detected from the
+file's first bytes) and keeps only pages whose title is a capital in the
+dataset, or "<capital>, <state>" (e.g. "Dover, Delaware", preferred over
+the ambiguous "Dover" when the dump has both). Memory use is constant in
+the size of the dump. Supported formats:
+  - JSON lines with a `title` and an `extract`, `abstract` or `opening_text`
+    field (CirrusSearch and Enterprise dumps; action/index lines are skipped)
+  - XML with <doc>/<page> records holding <title> and <abstract>/<extract>
+    (e.g. enwiki-latest-abstract.xml.gz)
+
+Usage:
+  python offline_extracts.py enwiki-latest-abstract.xml.gz --output capital_extracts.sqlite3
+  CAPITAL_ENRICH_SOURCE=offline CAPITAL_OFFLINE_INDEX=capital_extracts.sqlite3 python api_server.py
+
+The index keeps full extracts (up to MAX_EXTRACT characters); summaries are
+trimmed to `max_length` by the enricher exactly as for live API results.
+"""
+import asyncio
+import bz2
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from xml.etree.ElementTree import iterparse
+
+from dataset import open_dataset, CountryMap
+
+MAX_EXTRACT = 2000  # characters kept per page; summaries use only the first sentences
+INSERT_BATCH = 500
+TITLE_PREFIX = 'Wikipedia: '  # abstract dumps title every page like this
+EXTRACT_FIELDS = ('extract', 'abstract', 'opening_text')
+
+
+def open_dump(path: str):
+    """Open a dump as a binary stream, decompressing bz2 or gzip transparently."""
+    with open(path, 'rb') as f:
+        magic = f.read(3)
+    if magic[:2] == b'\x1f\x8b':
+        return gzip.open(path, 'rb')
+    if magic == b'BZh':
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_records(stream):
+    """Yield (title, extract) pairs from a JSONL or XML dump stream."""
+    stream = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+    head = stream.peek(64).lstrip()
+    if head.startswith(b'<'):
+        yield from _iter_xml(stream)
+    else:
+        yield from _iter_jsonl(stream)
+
+
+def _iter_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict) or not record.get('title'):
+            continue
+        for field in EXTRACT_FIELDS:
+            if record.get(field):
+                yield record['title'], record[field]
+                break
+
+
+def _iter_xml(stream):
+    root = None
+    title = extract = None
+    for event, elem in iterparse(stream, events=('start', 'end')):
+        if root is None:
+            root = elem
+        if event != 'end':
+            continue
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag == 'title':
+            title = elem.text or ''
+            if title.startswith(TITLE_PREFIX):
+                title = title[len(TITLE_PREFIX):]
+        elif tag in EXTRACT_FIELDS:
+            extract = elem.text or ''
+        elif tag in ('doc', 'page'):
+            if title and extract:
+                yield title, extract
+            title = extract = None
+            # drop finished records so memory stays flat
+            root.clear()
+
+
+def wanted_titles(countries=None) -> dict:
+    """Map dump titles to (capital, priority); lower priority wins, so "<capital>, <state>" beats a bare title."""
+    if countries is None:
+        countries = CountryMap(open_dataset())
+    wanted = {}
+    for regions in countries.values():
+        for state, capital in regions.items():
+            wanted.setdefault(capital, (capital, 1))
+            wanted[f'{capital}, {state}'] = (capital, 0)
+    return wanted
+
+
+def _create_index(conn):
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS extracts ('
+        'title TEXT PRIMARY KEY COLLATE NOCASE, extract TEXT NOT NULL, '
+        'page_title TEXT NOT NULL, priority INTEGER NOT NULL) WITHOUT ROWID'
+    )
+
+
+def _write_batch(conn, sql: str, rows: list):
+    # the connection is in autocommit mode, so group each batch into one transaction explicitly
+    conn.execute('BEGIN')
+    try:
+        conn.executemany(sql, rows)
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def ingest(dump_path: str, index_path: str, wanted: dict = None) -> dict:
+    """Stream `dump_path` into the SQLite index at `index_path`; return counts."""
+    if wanted is None:
+        wanted = wanted_titles()
+    stats = {'pages': 0, 'matched': 0}
+    conn = sqlite3.connect(index_path, isolation_level=None)
+    _create_index(conn)
+    upsert = ('INSERT INTO extracts VALUES (?, ?, ?, ?) ON CONFLICT(title) DO UPDATE SET '
+              'extract = excluded.extract, page_title = excluded.page_title, priority = excluded.priority '
+              'WHERE excluded.priority <= extracts.priority')
+    batch = []
+    with open_dump(dump_path) as stream:
+        for title, extract in iter_records(stream):
+            stats['pages'] += 1
+            match = wanted.get(title)
+            if match is None:
+                continue
+            capital, priority = match
+            batch.append((capital, extract.strip()[:MAX_EXTRACT], title, priority))
+            if len(batch) >= INSERT_BATCH:
+                _write_batch(conn, upsert, batch)
+                stats['matched'] += len(batch)
+                batch = []
+    if batch:
+        _write_batch(conn, upsert, batch)
+        stats['matched'] += len(batch)
+    stats['capitals'] = conn.execute('SELECT COUNT(*) FROM extracts').fetchone()[0]
+    conn.close()
+    return stats
+
+
+class OfflineExtractsClient:
+    """Drop-in replacement for WikipediaClient that reads an ingested index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # connections must not be shared across fork(); reopen in a child
+        if self._conn is None or self._pid != os.getpid():
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f'Offline extracts index not found: {self.path}')
+            self._conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def query_extracts(self, titles: list) -> dict:
+        """Return {requested title: full extract} for the titles in the index."""
+        if not titles:
+            return {}
+        placeholders = ','.join('?' * len(titles))
+        with self._lock:
+            rows = self._connection().execute(
+                f'SELECT title, extract FROM extracts WHERE title IN ({placeholders})', list(titles)).fetchall()
+        by_key = {title.lower(): extract for title, extract in rows}
+        return {title: by_key[title.lower()] for title in titles if title.lower() in by_key}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class AsyncOfflineExtractsClient(OfflineExtractsClient):
+    """Async-interface form for the ASGI server; index reads run in a thread, off the event loop."""
+
+    async def query_extracts(self, titles: list) -> dict:
+        return await asyncio.to_thread(OfflineExtractsClient.query_extracts, self, titles)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build an offline capital extracts index from a Wikipedia dump.')
+    parser.add_argument('dump', help='Dump file (.jsonl/.xml, optionally .gz or .bz2)')
+    parser.add_argument('--output', '-o', default='capital_extracts.sqlite3', help='Index file to create or update')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = ingest(args.dump, args.output)
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {stats['pages']} pages in {elapsed:.1f}s; "
+          f"{stats['capitals']} capitals indexed in {args.output}")
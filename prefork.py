@@ -0,0 +1,246 @@
+"""
+prefork.py
+
+Production launcher for the Capital Quest API: a parent process that
+supervises N pre-forked worker processes, all serving api_server.app on one
+shared listening socket.
+
+Before forking, the parent loads every country, builds the lookup indexes,
+loads the Wikipedia summary cache and builds the data bundle, then freezes
+the garbage collector, so workers share that memory copy-on-write instead of
+each building their own. Workers share summaries through the SQLite cache
+store: a summary fetched by one worker is a store hit for the others. Quiz
+sessions are shared through CAPITAL_QUIZ_DB (capital_quiz_sessions.sqlite3
+unless set). Rate-limit buckets stay in each worker's memory, and each
+worker enforces 1/N of the configured rates and bursts; set
+CAPITAL_RATE_LIMIT_DB to share exact buckets through SQLite instead, at the
+cost of a write lock per request. Metrics and the response cache stay per
+worker.
+
+Signals (send to the parent):
+  HUP        graceful reload: re-read the dataset and summary cache, start
+             new workers, then let the old ones finish in-flight requests
+  TERM, INT  graceful shutdown
+Workers that exit unexpectedly are replaced. With CAPITAL_WARM_CACHE=1 the
+cache warmer runs in the first worker only.
+
+Usage:
+  python prefork.py --workers 4 --port 5000 --pid-file capital_quest.pid
+  kill -HUP $(cat capital_quest.pid)
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# workers must agree on quiz sessions, so they cannot stay in one process's memory
+os.environ.setdefault('CAPITAL_QUIZ_DB', 'capital_quiz_sessions.sqlite3')
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+import api_server
+import capital_enricher
+import ratelimit
+from bundle import current_bundle
+from capital_lookup import warm_indexes, reload_dataset
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """Request handler without per-request access logging."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def warm(reload: bool = False) -> dict:
+    """Build everything workers would otherwise build lazily; return what was loaded."""
+    started = time.perf_counter()
+    if reload:
+        reload_dataset()
+    regions = warm_indexes()
+    capital_enricher.load_cache()
+    bundle = current_bundle(refresh=reload)
+    return {
+        'regions': regions,
+        'summaries': len(capital_enricher.CACHE),
+        'bundle': bundle.hash,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+class Launcher:
+    """Fork and supervise worker processes sharing one listening socket."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 5000, workers: int = 2,
+                 graceful_timeout: float = 30, access_log: bool = False, pid_file: str = None):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.access_log = access_log
+        self.pid_file = pid_file
+        self.sock = None
+        self.workers = {}   # pid -> slot
+        self.retiring = {}  # pid -> deadline for a graceful exit
+        self._reload = False
+        self._stop = False
+
+    def run(self):
+        """Warm up, fork the workers and supervise them until shutdown."""
+        if capital_enricher.CACHE_BACKEND == 'json':
+            print('Warning: the JSON cache backend is not shared safely between workers; '
+                  'use CAPITAL_CACHE_BACKEND=sqlite')
+        self.sock = socket.create_server((self.host, self.port), backlog=1024)
+        self.sock.set_inheritable(True)
+        if self.pid_file:
+            with open(self.pid_file, 'w') as f:
+                f.write(f'{os.getpid()}\n')
+
+        print(f'Warmed up: {warm()}')
+        gc.freeze()  # keep the warm objects out of GC passes so their pages stay shared
+
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        print(f'Capital Quest API on http://{self.host}:{self.port} with {self.num_workers} workers '
+              f'(parent pid {os.getpid()})')
+
+        try:
+            while not self._stop:
+                self._reap()
+                if self._reload:
+                    self._reload = False
+                    self.reload()
+                self._replace_missing()
+                time.sleep(0.2)
+        finally:
+            self.shutdown()
+
+    def reload(self):
+        """Re-warm from disk, start a new generation of workers and retire the old one."""
+        print('Reloading...')
+        gc.unfreeze()
+        print(f'Warmed up: {warm(reload=True)}')
+        gc.collect()
+        gc.freeze()
+        old, self.workers = self.workers, {}
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+            self.retiring[pid] = deadline
+
+    def shutdown(self):
+        """Stop every worker gracefully (forcefully after the timeout)."""
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in list(self.workers) + list(self.retiring):
+            self._signal(pid, signal.SIGTERM)
+            self.retiring[pid] = deadline
+        self.workers = {}
+        while self.retiring:
+            self._reap()
+            if self.retiring:
+                time.sleep(0.1)
+        if self.sock is not None:
+            self.sock.close()
+        if self.pid_file and os.path.exists(self.pid_file):
+            os.remove(self.pid_file)
+        print('Stopped.')
+
+    def _on_reload(self, signum, frame):
+        self._reload = True
+
+    def _on_stop(self, signum, frame):
+        self._stop = True
+
+    @staticmethod
+    def _signal(pid: int, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            slot = self.workers.pop(pid, None)
+            if slot is not None and not self._stop:
+                print(f'Warning: worker {slot} (pid {pid}) exited with status {status}; replacing it')
+            self.retiring.pop(pid, None)
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now >= deadline:
+                self._signal(pid, signal.SIGKILL)
+
+    def _replace_missing(self):
+        running = set(self.workers.values())
+        for slot in range(self.num_workers):
+            if slot not in running and not self._stop:
+                time.sleep(1)  # back off so a crashing worker does not spin
+                self._spawn(slot)
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = slot
+            return
+        code = 1
+        try:
+            code = self._serve(slot)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    def _serve(self, slot: int) -> int:
+        """Worker body: serve requests until the parent sends SIGTERM."""
+        # Ctrl-C reaches the whole process group; the parent decides what happens
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        if not ratelimit.RATE_LIMIT_DB:
+            ratelimit.split_limits(self.num_workers)
+        handler = WSGIRequestHandler if self.access_log else _QuietHandler
+        server = make_server(self.host, self.port, api_server.app, threaded=True,
+                             request_handler=handler, fd=self.sock.fileno())
+        server.daemon_threads = False  # server_close() waits for in-flight requests
+
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+        signal.signal(signal.SIGTERM, stop)
+
+        if slot == 0 and os.environ.get('CAPITAL_WARM_CACHE') == '1':
+            api_server.start_warmer()
+        server.serve_forever()
+        server.server_close()
+        return 0
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the Capital Quest API with pre-forked workers.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--graceful-timeout', type=float, default=30,
+                        help='Seconds a stopping worker may spend finishing requests')
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    parser.add_argument('--pid-file', help='Write the parent pid here (for kill -HUP)')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit('prefork.py needs fork(); on this platform run python api_server.py instead')
+    Launcher(args.host, args.port, max(1, args.workers), args.graceful_timeout,
+             args.access_log, args.pid_file).run()
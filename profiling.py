@@ -0,0 +1,172 @@
+"""
+profiling.py
+
+Opt-in request profiling for api_server.py.
+
+Profiling is off unless CAPITAL_PROFILE_TOKEN is set; without it no hooks
+are installed and requests pay nothing. With a token:
+  - a request carrying `X-Profile-Token: <token>` is always profiled
+  - otherwise a CAPITAL_PROFILE_RATE fraction of requests (default 0) is
+    sampled at random; the rate can be changed at runtime
+Results are aggregated per endpoint (Flask URL rule), in one of two modes
+(CAPITAL_PROFILE_MODE):
+  - cprofile: deterministic cProfile of the request thread, downloadable
+    as a .pstats file (`python -m pstats`, snakeviz, ...). Only one request
+    is profiled at a time; others are skipped while it runs.
+  - sample: a background thread records the request thread's stack every
+    CAPITAL_PROFILE_INTERVAL seconds (default 0.005), downloadable in the
+    collapsed-stack format used by flamegraph.pl and speedscope.
+Profiles cover the view function, i.e. find_capital, enrichment and JSON
+serialization; Wikipedia fetches that run on the background pool show up
+as time spent waiting for them.
+
+Usage:
+  CAPITAL_PROFILE_TOKEN=secret python api_server.py
+  curl -H 'X-Profile-Token: secret' -X POST -H 'Content-Type: application/json' \\
+       -d '{"rate": 0.05}' http://localhost:5000/api/admin/profile
+  curl -H 'X-Profile-Token: secret' -o lookup.pstats \\
+       'http://localhost:5000/api/admin/profile/download?endpoint=/api/lookup&format=pstats'
+"""
+import cProfile
+import hmac
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+TOKEN = os.environ.get('CAPITAL_PROFILE_TOKEN', '')
+ENABLED = bool(TOKEN)
+MODES = ('cprofile', 'sample')
+
+
+class Profiler:
+    """Per-endpoint aggregation of sampled request profiles."""
+
+    def __init__(self, token: str = TOKEN, rate: float = 0.0, mode: str = 'cprofile', interval: float = 0.005):
+        self.token = token
+        self.rate = rate
+        self.mode = mode
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._cprofile_busy = threading.Lock()  # cProfile can only watch one request at a time
+        self._stats = {}      # endpoint -> pstats.Stats
+        self._stacks = {}     # endpoint -> Counter of collapsed stacks
+        self._counts = Counter()
+        self._active = {}     # thread id -> endpoint, for the sampler
+        self._sampler = None
+
+    def check_token(self, token) -> bool:
+        """True if `token` matches the configured admin token; False for a missing or malformed one."""
+        if not self.token or not isinstance(token, str) or not token:
+            return False
+        # compare bytes: compare_digest rejects str with non-ASCII characters
+        return hmac.compare_digest(token.encode('utf-8', 'surrogateescape'), self.token.encode('utf-8', 'surrogateescape'))
+
+    def configure(self, rate: float = None, mode: str = None, reset: bool = False):
+        """Change the sampling rate and/or mode; `reset` drops collected profiles."""
+        if mode is not None and mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}')
+        if rate is not None and not 0 <= rate <= 1:
+            raise ValueError('rate must be between 0 and 1')
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if mode is not None:
+                self.mode = mode
+            if reset:
+                self._stats.clear()
+                self._stacks.clear()
+                self._counts.clear()
+
+    def start(self, endpoint: str, forced: bool = False):
+        """Begin profiling the current request if forced or sampled; return a handle or None."""
+        if not forced and (self.rate <= 0 or random.random() >= self.rate):
+            return None
+        if self.mode == 'sample':
+            self._ensure_sampler()
+            tid = threading.get_ident()
+            self._active[tid] = endpoint
+            return ('sample', endpoint, tid)
+        if not self._cprofile_busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return ('cprofile', endpoint, profile)
+
+    def stop(self, handle):
+        """Finish a profile started by `start` and fold it into its endpoint's totals."""
+        kind, endpoint, data = handle
+        if kind == 'sample':
+            self._active.pop(data, None)
+        else:
+            data.disable()
+            self._cprofile_busy.release()
+        with self._lock:
+            self._counts[endpoint] += 1
+            if kind == 'cprofile':
+                stats = self._stats.get(endpoint)
+                if stats is None:
+                    self._stats[endpoint] = pstats.Stats(data)
+                else:
+                    stats.add(data)
+
+    def _ensure_sampler(self):
+        with self._lock:
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        while self.mode == 'sample':
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for tid, endpoint in list(self._active.items()):
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                with self._lock:
+                    self._stacks.setdefault(endpoint, Counter())[key] += 1
+
+    def status(self) -> dict:
+        """Current settings and the number of profiled requests per endpoint."""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'rate': self.rate,
+                'profiled': dict(self._counts),
+                'pstats': sorted(self._stats),
+                'collapsed': sorted(self._stacks),
+            }
+
+    def pstats_bytes(self, endpoint: str):
+        """The aggregated profile for `endpoint` in the binary .pstats format, or None."""
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            return marshal.dumps(stats.stats) if stats is not None else None
+
+    def collapsed(self, endpoint: str):
+        """Sampled stacks for `endpoint` as collapsed-stack text ('a;b;c count' lines), or None."""
+        with self._lock:
+            stacks = self._stacks.get(endpoint)
+            if stacks is None:
+                return None
+            return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+PROFILER = Profiler(
+    rate=float(os.environ.get('CAPITAL_PROFILE_RATE', '0')),
+    mode=os.environ.get('CAPITAL_PROFILE_MODE', 'cprofile'),
+    interval=float(os.environ.get('CAPITAL_PROFILE_INTERVAL', '0.005')),
+)
@@ -0,0 +1,230 @@
+"""
+quiz.py
+
+Non-repeating quiz sessions: each session draws a country's regions in a
+random order without replacement, like dealing from a shuffled deck.
+
+A session holds only the country key, a cursor and a compact array of region
+positions (2 bytes each). The deck is shuffled incrementally (one
+Fisher-Yates step per draw), so creating a session and drawing from it are
+both O(1). When every region has been drawn, a new round starts.
+
+Sessions expire `ttl` seconds after their last use, and at most
+`max_sessions` are kept. QuizStore keeps them in memory, least recently
+used first, so expired and excess sessions are always at the front and are
+evicted in O(1). With several worker processes (prefork.py), a session must
+be visible to whichever worker gets the next request; SQLiteQuizStore keeps
+them in a shared SQLite file instead (CAPITAL_QUIZ_DB).
+
+Usage:
+  from quiz import open_quiz_store
+  quizzes = open_quiz_store()
+  quiz_id = quizzes.create('uk')
+  print(quizzes.draw(quiz_id))   # {'state': ..., 'capital': ..., 'remaining': 3, 'round': 1}
+"""
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from capital_lookup import region_count, region_at
+
+QUIZ_TTL = float(os.environ.get('CAPITAL_QUIZ_TTL', '1800'))
+QUIZ_MAX_SESSIONS = int(os.environ.get('CAPITAL_QUIZ_MAX_SESSIONS', '100000'))
+QUIZ_DB = os.environ.get('CAPITAL_QUIZ_DB')  # unset: sessions live in this process only
+PRUNE_EVERY = 64  # SQLiteQuizStore prunes expired sessions on about one create in this many
+
+
+def _deck_type(size: int) -> str:
+    return 'H' if size <= 0xFFFF else 'I'
+
+
+class QuizSession:
+    """One player's deck of region positions for a country."""
+    __slots__ = ('country', 'deck', 'cursor', 'round', 'expires_at')
+
+    def __init__(self, country: str, size: int, expires_at: float):
+        self.country = country
+        self.deck = array(_deck_type(size), range(size))
+        self.cursor = 0
+        self.round = 1
+        self.expires_at = expires_at
+
+    def draw(self) -> int:
+        """Return the next region position; every position comes up once per round."""
+        deck = self.deck
+        if self.cursor == len(deck):
+            self.cursor = 0
+            self.round += 1
+        i = self.cursor
+        j = random.randrange(i, len(deck))
+        deck[i], deck[j] = deck[j], deck[i]
+        self.cursor = i + 1
+        return deck[i]
+
+
+class QuizStore:
+    """Bounded, expiring {quiz id: QuizSession} map, safe to share across threads."""
+
+    def __init__(self, ttl: float = QUIZ_TTL, max_sessions: int = QUIZ_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now: float):
+        sessions = self._sessions
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if len(sessions) <= self.max_sessions and oldest.expires_at > now:
+                break
+            sessions.popitem(last=False)
+
+    def create(self, country_key: str):
+        """Start a session for `country_key`; return its id, or None for an unknown country."""
+        country_key = country_key.lower()
+        size = region_count(country_key)
+        if not size:
+            return None
+        quiz_id = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[quiz_id] = QuizSession(country_key, size, now + self.ttl)
+            self._evict(now)
+        return quiz_id
+
+    def draw(self, quiz_id: str):
+        """Draw the next region for a session.
+
+        Returns a dict with keys `state`, `capital`, `remaining` (left in this
+        round) and `round`, or None if the session is unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(quiz_id)
+            if session is None or session.expires_at <= now:
+                return None
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(quiz_id)
+            pos = session.draw()
+            remaining = len(session.deck) - session.cursor
+            round_ = session.round
+        item = region_at(session.country, pos)
+        item.update(remaining=remaining, round=round_)
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+class SQLiteQuizStore:
+    """QuizStore with sessions in a SQLite file, shared by every worker process."""
+
+    def __init__(self, path: str, ttl: float = QUIZ_TTL, max_sessions: int = QUIZ_MAX_SESSIONS):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # connections must not be shared across fork(); reopen in a child
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS quiz_sessions ('
+                'id TEXT PRIMARY KEY, country TEXT NOT NULL, deck BLOB NOT NULL, '
+                'cursor INTEGER NOT NULL, round INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS quiz_sessions_expiry ON quiz_sessions (expires_at)')
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM quiz_sessions').fetchone()[0]
+
+    def _prune(self, conn, now: float):
+        conn.execute('DELETE FROM quiz_sessions WHERE expires_at <= ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM quiz_sessions').fetchone()[0] - self.max_sessions
+        if excess > 0:
+            conn.execute('DELETE FROM quiz_sessions WHERE id IN '
+                         '(SELECT id FROM quiz_sessions ORDER BY expires_at LIMIT ?)', (excess,))
+
+    def create(self, country_key: str):
+        """Start a session for `country_key`; return its id, or None for an unknown country."""
+        country_key = country_key.lower()
+        size = region_count(country_key)
+        if not size:
+            return None
+        quiz_id = secrets.token_urlsafe(12)
+        now = time.time()
+        deck = array(_deck_type(size), range(size)).tobytes()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT INTO quiz_sessions VALUES (?, ?, ?, 0, 1, ?)',
+                         (quiz_id, country_key, deck, now + self.ttl))
+            if random.randrange(PRUNE_EVERY) == 0:
+                self._prune(conn, now)
+        return quiz_id
+
+    def draw(self, quiz_id: str):
+        """Draw the next region for a session (same result shape as `QuizStore.draw`)."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front, so two workers never deal the same card
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT country, deck, cursor, round, expires_at FROM quiz_sessions WHERE id = ?',
+                    (quiz_id,)).fetchone()
+                if row is None or row[4] <= now:
+                    conn.execute('COMMIT')
+                    return None
+                country, deck_bytes, cursor, round_, _ = row
+                size = region_count(country)
+                session = QuizSession.__new__(QuizSession)
+                session.country = country
+                session.deck = array(_deck_type(size))
+                session.deck.frombytes(deck_bytes)
+                if len(session.deck) != size:
+                    # the dataset was reloaded with a different region list
+                    conn.execute('DELETE FROM quiz_sessions WHERE id = ?', (quiz_id,))
+                    conn.execute('COMMIT')
+                    return None
+                session.cursor, session.round, session.expires_at = cursor, round_, now + self.ttl
+                pos = session.draw()
+                conn.execute(
+                    'UPDATE quiz_sessions SET deck = ?, cursor = ?, round = ?, expires_at = ? WHERE id = ?',
+                    (session.deck.tobytes(), session.cursor, session.round, session.expires_at, quiz_id))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        item = region_at(country, pos)
+        item.update(remaining=len(session.deck) - session.cursor, round=session.round)
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute('DELETE FROM quiz_sessions')
+
+
+def open_quiz_store(path: str = QUIZ_DB, ttl: float = QUIZ_TTL, max_sessions: int = QUIZ_MAX_SESSIONS):
+    """Return a SQLiteQuizStore for `path`, or an in-memory QuizStore when `path` is empty."""
+    if path:
+        return SQLiteQuizStore(path, ttl, max_sessions)
+    return QuizStore(ttl, max_sessions)
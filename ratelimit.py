@@ -0,0 +1,221 @@
+"""
+ratelimit.py
+
+Token-bucket rate limiting for the API servers.
+
+Each key (a client address, or the shared 'upstream' budget) owns a bucket
+holding up to `burst` tokens that refills at `rate` tokens per second. A
+request takes one token; when the bucket is empty the caller is told how
+many seconds to wait, which the server sends back as `429 Too Many Requests`
+with a `Retry-After` header.
+
+Two limits use this:
+  - per client (CAPITAL_RATE_LIMIT requests/second, CAPITAL_RATE_BURST burst),
+    keyed by the client address; CAPITAL_RATE_LIMIT=0 turns it off
+  - one global upstream budget (CAPITAL_UPSTREAM_BUDGET per second,
+    CAPITAL_UPSTREAM_BURST burst) spent only by /api/enriched requests for
+    capitals that are neither in the dataset nor cached, so made-up names
+    cannot turn into unbounded Wikipedia calls and cache writes
+
+Clients are keyed by the peer address. Behind reverse proxies, set
+CAPITAL_TRUST_PROXY to the number of proxies in front of the server: the
+client is then the address that many hops from the right of
+X-Forwarded-For, the last one a trusted proxy appended. Entries further
+left are whatever the client sent and are never used.
+
+Buckets live in memory by default (MemoryBucketStore). With several worker
+processes (prefork.py), each worker keeps its own buckets and enforces its
+share of the limits (split_limits). Set CAPITAL_RATE_LIMIT_DB to keep them in
+a shared SQLite file (SQLiteBucketStore) instead; the limits are then exact,
+but every request takes the file's write lock, which serializes the workers.
+Any object with the same `take(key, rate, burst, cost)` method can serve as a
+store.
+
+Usage:
+  from ratelimit import RateLimiter
+  limiter = RateLimiter(rate=5, burst=10)
+  wait = limiter.acquire('203.0.113.7')
+  if wait:
+      print(f'retry in {wait:.1f}s')
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from capital_lookup import is_known_capital
+from capital_enricher import get_cached_entry
+
+RATE_LIMIT = float(os.environ.get('CAPITAL_RATE_LIMIT', '20'))  # requests/second per client; 0 disables
+RATE_BURST = float(os.environ.get('CAPITAL_RATE_BURST', '40'))
+UPSTREAM_BUDGET = float(os.environ.get('CAPITAL_UPSTREAM_BUDGET', '1'))  # unknown-capital fetches/second, all clients
+UPSTREAM_BURST = float(os.environ.get('CAPITAL_UPSTREAM_BURST', '10'))
+RATE_LIMIT_DB = os.environ.get('CAPITAL_RATE_LIMIT_DB')  # unset: buckets live in this process only
+MAX_BUCKETS = int(os.environ.get('CAPITAL_RATE_LIMIT_MAX_CLIENTS', '100000'))
+TRUSTED_PROXIES = int(os.environ.get('CAPITAL_TRUST_PROXY', '0'))  # reverse proxies in front of the server
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, burst: float, cost: float):
+    """Return (tokens left, seconds to wait) after trying to take `cost` tokens."""
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets in a bounded in-process map, least recently used first."""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens from `key`'s bucket; return 0, or the seconds until they are available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens, wait = _refill(tokens, updated_at, now, rate, burst, cost)
+            self._buckets[key] = (tokens, now)
+            # a forgotten client simply starts again with a full bucket
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file, shared by every worker process."""
+
+    def __init__(self, path: str, max_buckets: int = MAX_BUCKETS):
+        self.path = path
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._takes = 0
+
+    def _connection(self):
+        # connections must not be shared across fork(); reopen in a child
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # losing buckets in a crash only resets the limits
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS rate_buckets_updated ON rate_buckets (updated_at)')
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0]
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens from `key`'s bucket; return 0, or the seconds until they are available."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front, so two workers never spend the same token
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT tokens, updated_at FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                tokens, updated_at = row if row is not None else (burst, now)
+                tokens, wait = _refill(tokens, updated_at, now, rate, burst, cost)
+                conn.execute('INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?)', (key, tokens, now))
+                self._takes += 1
+                if self._takes % 1024 == 0:
+                    self._prune(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return wait
+
+    def _prune(self, conn):
+        excess = conn.execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0] - self.max_buckets
+        if excess > 0:
+            conn.execute('DELETE FROM rate_buckets WHERE key IN '
+                         '(SELECT key FROM rate_buckets ORDER BY updated_at LIMIT ?)', (excess,))
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute('DELETE FROM rate_buckets')
+
+
+def open_bucket_store(path: str = RATE_LIMIT_DB):
+    """Return a SQLiteBucketStore for `path`, or a MemoryBucketStore when `path` is empty."""
+    if path:
+        return SQLiteBucketStore(path)
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    """A `rate` per second, `burst` deep token bucket per key, kept in `store`."""
+
+    def __init__(self, rate: float, burst: float, store=None, prefix: str = ''):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.store = store if store is not None else MemoryBucketStore()
+        self.prefix = prefix  # keeps limiters that share a store apart
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Spend `cost` tokens for `key`; return 0 if allowed, else the seconds to wait."""
+        if not self.enabled:
+            return 0.0
+        return self.store.take(self.prefix + key, self.rate, self.burst, cost)
+
+
+STORE = open_bucket_store()
+CLIENT_LIMITER = RateLimiter(RATE_LIMIT, RATE_BURST, STORE, prefix='client:')
+UPSTREAM_LIMITER = RateLimiter(UPSTREAM_BUDGET, UPSTREAM_BURST, STORE, prefix='upstream:')
+
+
+def split_limits(workers: int):
+    """Give this process 1/`workers` of every limit, for worker processes that keep their own buckets."""
+    for limiter in (CLIENT_LIMITER, UPSTREAM_LIMITER):
+        limiter.rate /= workers
+        limiter.burst = max(limiter.burst / workers, 1.0)
+
+
+def forwarded_client(peer: str, forwarded_for: str, trusted: int = TRUSTED_PROXIES) -> str:
+    """The client address behind `trusted` proxies (same rule as werkzeug's ProxyFix(x_for=trusted))."""
+    if trusted and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',')]
+        if len(hops) >= trusted and hops[-trusted]:
+            return hops[-trusted]
+    return peer or 'unknown'
+
+
+def retry_after(wait: float) -> int:
+    """Whole seconds for a Retry-After header (never 0)."""
+    return max(1, math.ceil(wait))
+
+
+def upstream_wait(capital: str) -> float:
+    """Spend upstream budget if enriching `capital` would have to ask Wikipedia.
+    
+    Capitals in the dataset and anything already cached (including recent
+    failures) are free. Returns 0 if allowed, else the seconds to wait.
+    """
+    if not UPSTREAM_LIMITER.enabled or is_known_capital(capital):
+        return 0.0
+    if get_cached_entry(capital, record=False) is not None:
+        return 0.0
+    return UPSTREAM_LIMITER.acquire('wikipedia')
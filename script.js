@@ -1,41 +1,3 @@
-const data = {
-  us: {
-    "Alabama":"Montgomery","Alaska":"Juneau","Arizona":"Phoenix","Arkansas":"Little Rock","California":"Sacramento",
-    "Colorado":"Denver","Connecticut":"Hartford","Delaware":"Dover","Florida":"Tallahassee","Georgia":"Atlanta",
-    "Hawaii":"Honolulu","Idaho":"Boise","Illinois":"Springfield","Indiana":"Indianapolis","Iowa":"Des Moines",
-    "Kansas":"Topeka","Kentucky":"Frankfort","Louisiana":"Baton Rouge","Maine":"Augusta","Maryland":"Annapolis",
-    "Massachusetts":"Boston","Michigan":"Lansing","Minnesota":"St. Paul","Mississippi":"Jackson","Missouri":"Jefferson City",
-    "Montana":"Helena","Nebraska":"Lincoln","Nevada":"Carson City","New Hampshire":"Concord","New Jersey":"Trenton",
-    "New Mexico":"Santa Fe","New York":"Albany","North Carolina":"Raleigh","North Dakota":"Bismarck","Ohio":"Columbus",
-    "Oklahoma":"Oklahoma City","Oregon":"Salem","Pennsylvania":"Harrisburg","Rhode Island":"Providence","South Carolina":"Columbia",
-    "South Dakota":"Pierre","Tennessee":"Nashville","Texas":"Austin","Utah":"Salt Lake City","Vermont":"Montpelier",
-    "Virginia":"Richmond","Washington":"Olympia","West Virginia":"Charleston","Wisconsin":"Madison","Wyoming":"Cheyenne",
-    "District of Columbia":"Washington, D.C."},
-  india: {
-    "Andhra Pradesh":"Amaravati","Arunachal Pradesh":"Itanagar","Assam":"Dispur","Bihar":"Patna","Chhattisgarh":"Raipur",
-    "Goa":"Panaji","Gujarat":"Gandhinagar","Haryana":"Chandigarh","Himachal Pradesh":"Shimla","Jharkhand":"Ranchi",
-    "Karnataka":"Bengaluru","Kerala":"Thiruvananthapuram","Madhya Pradesh":"Bhopal","Maharashtra":"Mumbai","Manipur":"Imphal",
-    "Meghalaya":"Shillong","Mizoram":"Aizawl","Nagaland":"Kohima","Odisha":"Bhubaneswar","Punjab":"Chandigarh",
-    "Rajasthan":"Jaipur","Sikkim":"Gangtok","Tamil Nadu":"Chennai","Telangana":"Hyderabad","Tripura":"Agartala",
-    "Uttar Pradesh":"Lucknow","Uttarakhand":"Dehradun","West Bengal":"Kolkata",
-    "Andaman and Nicobar Islands":"Port Blair","Chandigarh (UT)":"Chandigarh","Dadra and Nagar Haveli and Daman and Diu":"Daman",
-    "Delhi":"New Delhi","Jammu and Kashmir":"Srinagar","Ladakh":"Leh","Puducherry":"Puducherry","Lakshadweep":"Kavaratti"},
-  uk: {
-    "England":"London","Scotland":"Edinburgh","Wales":"Cardiff","Northern Ireland":"Belfast"}
-}
-
-const funFacts = {
-  "Sacramento":"Sacramento started as a Gold Rush town and has a historic riverfront.",
-  "New Delhi":"New Delhi is home to India Gate and the grand Rashtrapati Bhavan.",
-  "London":"London has the famous River Thames and a long history back to Roman times.",
-  "Bengaluru":"Bengaluru is known as India’s tech hub — Silicon Valley of India.",
-  "Albany":"Albany is one of the oldest surviving settlements of the original British thirteen colonies.",
-  "Edinburgh":"Edinburgh has a castle on a volcanic rock — great for imagining knights!",
-  "Austin":"Austin is famous for music and live concerts — 'Keep Austin Weird' is its motto.",
-  "Chennai":"Chennai has beautiful temples and a long coastline on the Bay of Bengal.",
-  "Mumbai":"Mumbai is India's largest city and home to Bollywood films.",
-}
-
 // API base (defaults to local Flask server). You can override by setting
 // `window.API_BASE` before loading this script (useful in production).
 const API_BASE = window.API_BASE || 'http://localhost:5000';
@@ -63,40 +25,107 @@ function countryToEmoji(c){
   return '🌍';
 }
 
-function populateSuggestions(){
-  const c = countrySelect.value;
+// the whole dataset from /api/bundle (regions, facts, cached summaries);
+// once it has loaded, lookups, suggestions and Surprise Me run in the page
+let bundle = null;
+
+function loadBundle(){
+  return fetch(`${API_BASE}/api/bundle`)
+    .then(res => res.ok ? res.json() : null)
+    .then(body => {
+      if(!body) return null;
+      const countries = {};
+      body.countries.forEach(item => { countries[item.key] = item; });
+      bundle = {list: body.countries, countries, facts: body.facts, summaries: body.summaries};
+      return bundle;
+    })
+    .catch(() => null);
+}
+
+function localRegions(countryKey){
+  return bundle && bundle.countries[countryKey] ? bundle.countries[countryKey].regions : null;
+}
+
+function findLocal(query, countryKey){
+  // same order as the server: exact -> startswith -> includes
+  const q = normalize(query);
+  const regions = localRegions(countryKey);
+  const hit = regions.find(([s]) => normalize(s) === q)
+    || regions.find(([s]) => normalize(s).startsWith(q))
+    || regions.find(([s]) => normalize(s).includes(q));
+  if(!hit) return null;
+  const [state, capital] = hit;
+  const summary = bundle.summaries[capital] || '';
+  return {
+    state, capital,
+    fact: bundle.facts[capital] || `${capital} is an interesting place to visit!`,
+    wikipedia_summary: summary,
+    source: summary ? 'wikipedia' : 'local'
+  };
+}
+
+function suggestLocal(query, countryKey, limit){
+  const q = normalize(query);
+  const byName = (a, b) => normalize(a[0]) < normalize(b[0]) ? -1 : 1;
+  const regions = localRegions(countryKey);
+  const starts = regions.filter(([s]) => normalize(s).startsWith(q)).sort(byName);
+  const contains = regions.filter(([s]) => !normalize(s).startsWith(q) && normalize(s).includes(q)).sort(byName);
+  return starts.concat(contains).slice(0, limit).map(([state, capital]) => ({state, capital}));
+}
+
+// latest typeahead results (state + capital)
+let currentSuggestions = [];
+let suggestTimer = null;
+let suggestController = null;
+
+function renderSuggestions(items){
+  currentSuggestions = items;
   suggestions.innerHTML = '';
-  Object.keys(data[c]).forEach(k=>{
+  items.forEach(item=>{
     const opt = document.createElement('option');
-    opt.value = k;
+    opt.value = item.state;
     suggestions.appendChild(opt);
   });
+  return items;
 }
 
-function findCapital(query, countryKey){
-  if(!query) return null;
-  const map = data[countryKey];
-  const q = normalize(query);
-  // exact match
-  for(const k of Object.keys(map)){
-    if(normalize(k) === q) return {state:k,capital:map[k]};
-  }
-  // startswith
-  for(const k of Object.keys(map)){
-    if(normalize(k).startsWith(q)) return {state:k,capital:map[k]};
-  }
-  // includes
-  for(const k of Object.keys(map)){
-    if(normalize(k).includes(q)) return {state:k,capital:map[k]};
+function populateSuggestions(query){
+  const c = countrySelect.value;
+  if(localRegions(c)) return Promise.resolve(renderSuggestions(suggestLocal(query || '', c, 10)));
+  if(suggestController) suggestController.abort();
+  suggestController = new AbortController();
+  const url = `${API_BASE}/api/suggest?country=${encodeURIComponent(c)}&q=${encodeURIComponent(query || '')}&limit=10`;
+  return fetch(url, {signal: suggestController.signal})
+    .then(res => res.json())
+    .then(body => renderSuggestions(body.suggestions || []))
+    .catch(() => currentSuggestions);
+}
+
+function lookupState(query, countryKey){
+  if(localRegions(countryKey)){
+    const item = findLocal(query, countryKey);
+    // misses still ask the server, which knows typo-tolerant did-you-mean hints
+    if(item) return Promise.resolve(item);
   }
-  return null;
+  // resolve state -> capital + fact on the server (same matching as the CLI)
+  const url = `${API_BASE}/api/lookup?country=${encodeURIComponent(countryKey)}&state=${encodeURIComponent(query)}`;
+  return fetch(url)
+    .then(res => res.json())
+    .catch(() => ({error: 'API unavailable'}));
 }
 
 function showResult(item, countryKey){
-  if(!item){
+  if(!item || item.error){
     stateNameEl.textContent = 'Not found';
     capitalNameEl.textContent = 'Try another name or pick from suggestions.';
-    funFactEl.textContent = 'Tip: try a full state name like "California" or "Karnataka".';
+    const hints = (item && item.did_you_mean) || [];
+    if(hints.length){
+      funFactEl.textContent = `Did you mean ${hints.map(h => h.state).join(' or ')}?`;
+    } else if(item && item.error === 'API unavailable'){
+      funFactEl.textContent = `Could not reach the Capital Quest server at ${API_BASE}.`;
+    } else {
+      funFactEl.textContent = 'Tip: try a full state name like "California" or "Karnataka".';
+    }
     flagEl.textContent = countryToEmoji(countryKey);
     card.classList.remove('hidden');
     return;
@@ -105,44 +134,70 @@ function showResult(item, countryKey){
   capitalNameEl.textContent = item.capital;
   flagEl.textContent = countryToEmoji(countryKey);
   
-  // fetch enriched fact from API (or local fallback)
-  fetchEnrichedFact(item.capital);
+  funFactEl.innerHTML = item.fact || 'Interesting place to explore!';
+  // append Wikipedia summary if available
+  if(item.wikipedia_summary){
+    funFactEl.innerHTML += `<br><br><strong>More info:</strong> ${item.wikipedia_summary}`;
+  }
   card.classList.remove('hidden');
 }
 
-function fetchEnrichedFact(capitalName){
-  // try to fetch from API; fallback to local facts
-  const apiUrl = `${API_BASE}/api/enriched?capital=${encodeURIComponent(capitalName)}`;
-  
-  fetch(apiUrl)
-    .then(res => res.json())
-    .then(data => {
-      funFactEl.innerHTML = data.fact || 'Interesting place to explore!';
-      // append Wikipedia summary if available
-      if(data.wikipedia_summary){
-        funFactEl.innerHTML += `<br><br><strong>More info:</strong> ${data.wikipedia_summary}`;
-      }
-    })
-    .catch(err => {
-      // fallback to local facts if API unavailable
-      funFactEl.textContent = funFacts[capitalName] || `Fun fact: ${capitalName} is interesting — explore more!`;
-    });
-}
-
 findBtn.addEventListener('click',()=>{
   const countryKey = countrySelect.value;
   const q = stateInput.value;
-  const item = findCapital(q,countryKey);
-  showResult(item,countryKey);
+  if(!q.trim()){ showResult(null, countryKey); return; }
+  lookupState(q, countryKey).then(item => showResult(item, countryKey));
 });
 
+// "Surprise Me!" draws from a server-side quiz session so states don't repeat
+let quizId = null;
+
+function startQuiz(countryKey){
+  return fetch(`${API_BASE}/api/quiz`, {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({country: countryKey})
+  })
+    .then(res => res.json())
+    .then(body => { quizId = body.quiz_id; return quizId; });
+}
+
+// bundle mode: a shuffled deck per country, dealt one card at a time
+const decks = {};
+
+function nextLocalPick(countryKey){
+  const regions = localRegions(countryKey);
+  let deck = decks[countryKey];
+  if(!deck || deck.cursor === deck.order.length){
+    deck = decks[countryKey] = {order: regions.map((_, i) => i), cursor: 0};
+  }
+  const i = deck.cursor;
+  const j = i + Math.floor(Math.random() * (deck.order.length - i));
+  [deck.order[i], deck.order[j]] = [deck.order[j], deck.order[i]];
+  deck.cursor = i + 1;
+  const [state, capital] = regions[deck.order[i]];
+  return {state, capital};
+}
+
+function nextQuizPick(countryKey){
+  if(localRegions(countryKey)) return Promise.resolve(nextLocalPick(countryKey));
+  const draw = () => fetch(`${API_BASE}/api/quiz/${quizId}/next`);
+  return (quizId ? Promise.resolve(quizId) : startQuiz(countryKey))
+    .then(draw)
+    // sessions expire after a while; start a fresh one and retry once
+    .then(res => res.status === 404 ? startQuiz(countryKey).then(draw) : res)
+    .then(res => res.json());
+}
+
 randomBtn.addEventListener('click',()=>{
   const c = countrySelect.value;
-  const keys = Object.keys(data[c]);
-  const state = keys[Math.floor(Math.random()*keys.length)];
-  const capital = data[c][state];
-  stateInput.value = state;
-  showResult({state,capital}, c);
+  nextQuizPick(c)
+    .then(pick => {
+      stateInput.value = pick.state;
+      return lookupState(pick.state, c);
+    })
+    .then(item => showResult(item, c))
+    .catch(() => showResult({error: 'API unavailable'}, c));
 });
 
 speakBtn.addEventListener('click',()=>{
@@ -164,20 +219,48 @@ againBtn.addEventListener('click',()=>{
 });
 
 countrySelect.addEventListener('change',()=>{
-  populateSuggestions();
+  quizId = null;
+  populateSuggestions('');
   card.classList.add('hidden');
   stateInput.value = '';
 });
 
 stateInput.addEventListener('input',()=>{
-  // live attempt suggestion: show if a good match
+  // debounce keystrokes, then refresh suggestions and show an exact match
+  clearTimeout(suggestTimer);
   const cur = stateInput.value;
-  const res = findCapital(cur, countrySelect.value);
-  if(res) showResult(res, countrySelect.value);
+  const c = countrySelect.value;
+  suggestTimer = setTimeout(()=>{
+    populateSuggestions(cur).then(items=>{
+      const match = items.find(item => normalize(item.state) === normalize(cur));
+      if(match) lookupState(match.state, c).then(item => showResult(item, c));
+    });
+  }, 150);
 });
 
-// initialize
-populateSuggestions();
+function fillCountries(list){
+  const current = countrySelect.value;
+  countrySelect.innerHTML = '';
+  list.forEach(item=>{
+    const opt = document.createElement('option');
+    opt.value = item.key;
+    opt.textContent = item.name;
+    countrySelect.appendChild(opt);
+  });
+  if(list.some(item => item.key === current)) countrySelect.value = current;
+}
+
+function loadCountries(){
+  // the dataset decides which countries exist; keep the static options if the API is down
+  if(bundle) return Promise.resolve(fillCountries(bundle.list));
+  return fetch(`${API_BASE}/api/countries`)
+    .then(res => res.json())
+    .then(body => { if(body.countries) fillCountries(body.countries); })
+    .catch(() => {});
+}
+
+// initialize: one cacheable bundle download, falling back to per-request API calls
+loadBundle().then(loadCountries).then(() => populateSuggestions(''));
 
 // make Enter press behave like Find
 stateInput.addEventListener('keydown', e=>{
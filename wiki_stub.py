@@ -0,0 +1,133 @@
+"""
+wiki_stub.py
+
+A local stand-in for the MediaWiki extracts API, for benchmarks and offline
+experiments. It answers `action=query&prop=extracts` requests for any titles
+with a generated extract, and can add latency and random failures.
+
+Titles are "normalized" like MediaWiki does (first letter upper-cased) and
+reported in the `normalized` section, so clients exercise the same title
+mapping as against the real API.
+
+Usage:
+  python wiki_stub.py --port 8089 --latency 0.2 --error-rate 0.05
+  CAPITAL_WIKI_API_URL=http://127.0.0.1:8089/w/api.php python api_server.py
+
+  from wiki_stub import StubWikipediaServer
+  with StubWikipediaServer(latency=0.05) as stub:
+      print(stub.api_url)
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; with Nagle on, every reused
+    # keep-alive connection would stall ~40 ms on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.count_request()
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.error_rate and random.random() < stub.error_rate:
+            self._send(503, b'{"error": "stub failure"}')
+            return
+
+        params = parse_qs(urlsplit(self.path).query)
+        titles = params.get('titles', [''])[0].split('|') if params.get('titles') else []
+        normalized = []
+        pages = {}
+        for i, title in enumerate(titles):
+            page_title = title[:1].upper() + title[1:]
+            if page_title != title:
+                normalized.append({'from': title, 'to': page_title})
+            pages[str(i + 1)] = {
+                'pageid': i + 1,
+                'title': page_title,
+                'extract': (f'{page_title} is a city used for benchmarking. '
+                            f'It has a long and interesting history. '
+                            f'Many people visit {page_title} every year.'),
+            }
+        body = json.dumps({
+            'batchcomplete': '',
+            'query': {'normalized': normalized, 'pages': pages},
+        }).encode('utf-8')
+        self._send(200, body)
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open many connections at once
+
+
+class StubWikipediaServer:
+    """Threaded local MediaWiki stub with configurable latency and error rate."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/w/api.php'
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='wiki-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local MediaWiki extracts API stub.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    stub = StubWikipediaServer(args.host, args.port, args.latency, args.error_rate).start()
+    print(f'Stub MediaWiki API on {stub.api_url} (latency={args.latency}s, error rate={args.error_rate})')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()